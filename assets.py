@@ -0,0 +1,124 @@
+# Sprites and sounds for the pygame front end.
+#
+# Each piece set is drawn once per square size into a single atlas surface
+# and cached on disk, keyed by a hash of the source images, so later starts
+# decode one small PNG instead of loading and rescaling twelve large ones.
+# pygame is only imported when something is actually loaded, so engine-only
+# code can import this module without touching it.
+
+import hashlib
+import os
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ASSET_DIR, ".asset_cache")
+ATLAS_VERSION = 1  # Bump when the way sprites are drawn into the atlas changes
+PIECE_SCALE = 0.8  # Pieces fill 80% of a square, anchored at its top-left corner
+
+PIECE_ORDER = [
+    "PawnWhite", "PawnBlack", "RookWhite", "RookBlack", "BishopWhite", "BishopBlack",
+    "KnightWhite", "KnightBlack", "QueenWhite", "QueenBlack", "KingWhite", "KingBlack"
+]
+PIECE_SETS = ("classic", "text")
+SOUNDS = {"move": "move.mp3"}
+
+
+def _find_file(path):
+    # The images were named on a case-insensitive filesystem ("pawnWhite.png"
+    # is loaded as "PawnWhite.png"), so fall back to a case-insensitive match.
+    if os.path.exists(path):
+        return path
+    folder, name = os.path.split(path)
+    for candidate in os.listdir(folder):
+        if candidate.lower() == name.lower():
+            return os.path.join(folder, candidate)
+    raise FileNotFoundError(path)
+
+
+def source_path(piece_set, name):
+    if piece_set == "text":
+        kind, color = name[:-5], name[-5:]
+        return _find_file(os.path.join(ASSET_DIR, "textChessPiece", f"{kind}Text{color}.png"))
+    return _find_file(os.path.join(ASSET_DIR, f"{name}.png"))
+
+
+def source_hash(piece_set):
+    digest = hashlib.sha1(f"v{ATLAS_VERSION}".encode())
+    for name in PIECE_ORDER:
+        with open(source_path(piece_set, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class AssetManager:
+    def __init__(self, square_size, piece_set="classic", cache_dir=CACHE_DIR):
+        self.square_size = square_size
+        self.piece_set = piece_set
+        self.cache_dir = cache_dir
+        self.atlases = {}  # (piece set, square size) -> surface
+        self.sounds = {}
+        # Sub-rect of each piece inside an atlas
+        self.rects = {name: (i * square_size, 0, square_size, square_size)
+                      for i, name in enumerate(PIECE_ORDER)}
+
+    def set_piece_set(self, piece_set):
+        if piece_set not in PIECE_SETS:
+            raise ValueError(f"Unknown piece set: {piece_set}")
+        self.piece_set = piece_set
+
+    def atlas(self):
+        key = (self.piece_set, self.square_size)
+        surface = self.atlases.get(key)
+        if surface is None:
+            surface = self.atlases[key] = self._load_atlas()
+        return surface
+
+    def _load_atlas(self):
+        import pygame
+
+        cache_path = os.path.join(
+            self.cache_dir, f"atlas-{self.piece_set}-{self.square_size}-{source_hash(self.piece_set)}.png")
+        if os.path.exists(cache_path):
+            surface = pygame.image.load(cache_path)
+        else:
+            surface = self._build_atlas()
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                pygame.image.save(surface, cache_path)
+            except (OSError, pygame.error):
+                pass  # A read-only install still works, just without the cache
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        return surface
+
+    def _build_atlas(self):
+        import pygame
+
+        size = self.square_size
+        atlas = pygame.Surface((size * len(PIECE_ORDER), size), pygame.SRCALPHA)
+        for i, name in enumerate(PIECE_ORDER):
+            image = pygame.image.load(source_path(self.piece_set, name))
+            image = pygame.transform.scale(image, (size, size))
+            image = pygame.transform.rotozoom(image, 0, PIECE_SCALE)
+            atlas.blit(image, (i * size, 0))
+        return atlas
+
+    def blit_piece(self, surface, name, pos):
+        surface.blit(self.atlas(), pos, self.rects[name])
+
+    def sound(self, name):
+        # Loaded on first use; None when there is no audio device
+        if name not in self.sounds:
+            import pygame
+
+            try:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                self.sounds[name] = pygame.mixer.Sound(os.path.join(ASSET_DIR, SOUNDS[name]))
+            except pygame.error:
+                self.sounds[name] = None
+        return self.sounds[name]
+
+    def play(self, name):
+        sound = self.sound(name)
+        if sound is not None:
+            sound.play()
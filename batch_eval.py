@@ -0,0 +1,245 @@
+# Vectorized evaluation of many positions at once, for self-play analysis and
+# evaluation tuning. Positions are an (N, 64) int8 array of piece codes laid
+# out like Position.squares, so a batch is just np.frombuffer over the boards.
+#
+# The material and piece-square score is the same tapered sum evaluate()
+# keeps incrementally, gathered from the signed tables in one indexing step.
+# Mobility (knight, bishop, rook and queen moves to empty or enemy squares,
+# pins ignored) is counted on bitboards: each piece set of every board is
+# packed into a uint64, and whole batches are shifted along a direction at
+# once instead of walking rays square by square.
+#
+#   python batch_eval.py                  # positions/sec, batch against scalar
+#   python batch_eval.py --count 200000
+#
+# numpy is only needed for the batch functions; the scalar reference works
+# without it.
+
+import argparse
+import random
+import sys
+import time
+
+from evaluation import EG_TABLES, MAX_PHASE, MG_TABLES, PHASE, compute
+from movegen import KNIGHT_OFFSETS, KNIGHT_TARGETS, SLIDER_RAYS, generate_moves
+from position import BISHOP, KNIGHT, QUEEN, ROOK, WHITE, Position
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("batch evaluation needs numpy: pip install numpy")
+
+
+def to_array(boards):
+    # (N, 64) int8 from Positions or 64-byte square buffers
+    _require_numpy()
+    data = b"".join(bytes(getattr(board, "squares", board)) for board in boards)
+    return np.frombuffer(data, dtype=np.int8).reshape(-1, 64)
+
+
+def _packed_table(mg_tables, eg_tables):
+    # One int64 per (square, piece) holding mg << 32 plus eg, so a single
+    # gather and sum gives both totals; flattened square-major for the index
+    mg = np.asarray(mg_tables, dtype=np.int64)
+    eg = np.asarray(eg_tables, dtype=np.int64)
+    return ((mg << 32) + eg).T.ravel()
+
+
+def material_pst(boards, mg_tables=None, eg_tables=None):
+    # Tapered material and piece-square score from White's side. Tuning can
+    # pass candidate [15][64] tables instead of the engine's own
+    _require_numpy()
+    if mg_tables is None and eg_tables is None:
+        table = PACKED_TABLE
+    else:
+        table = _packed_table(MG_TABLES if mg_tables is None else mg_tables,
+                              EG_TABLES if eg_tables is None else eg_tables)
+    total = table[boards + SQUARE_OFFSETS].sum(axis=1)
+    mg = (total + (1 << 31)) >> 32
+    eg = total - (mg << 32)
+    phase = np.minimum(PHASE_ARRAY[boards].sum(axis=1), MAX_PHASE)
+    return (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def _step_masks():
+    # (shift, mask) moving a bitboard dr rows and dc columns; the mask clears
+    # squares that wrapped around to the other edge of the board
+    steps = {}
+    for dr in range(-2, 3):
+        for dc in range(-2, 3):
+            mask = 0
+            for sq in range(64):
+                row, col = (sq >> 3) - dr, (sq & 7) - dc
+                if 0 <= row < 8 and 0 <= col < 8:
+                    mask |= 1 << sq
+            steps[dr, dc] = (dr * 8 + dc, np.uint64(mask))
+    return steps
+
+
+if np is not None:
+    PACKED_TABLE = _packed_table(MG_TABLES, EG_TABLES)
+    SQUARE_OFFSETS = np.arange(0, 64 * 15, 15, dtype=np.int16)
+    PHASE_ARRAY = np.asarray(PHASE, dtype=np.int64)
+    STEPS = _step_masks()
+
+
+def _shift(bits, dr, dc):
+    shift, mask = STEPS[dr, dc]
+    if shift >= 0:
+        return (bits << np.uint64(shift)) & mask
+    return (bits >> np.uint64(-shift)) & mask
+
+
+def _popcount(bits):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).astype(np.int32)
+    # numpy < 2.0: count the bytes through a lookup table
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32)
+    return table[bits.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def _bitboards(boards, predicate):
+    # (N,) uint64 with bit sq set where predicate holds for square sq
+    packed = np.packbits(predicate, axis=1, bitorder="little")
+    return packed.view("<u8").reshape(len(boards)).astype(np.uint64)
+
+
+def mobility_counts(boards):
+    # (N, 2) int32: pseudo-legal piece moves for White and for Black. Boards
+    # are packed into one uint64 per piece set, so every step below works on
+    # N words. Rays of one side's sliders in one direction never overlap, and
+    # neither do knights moved by one offset, so each popcount counts moves
+    # per piece as the scalar walk does
+    _require_numpy()
+    kinds = boards & 7
+    empty = _bitboards(boards, boards == 0)
+    counts = np.zeros((len(boards), 2), dtype=np.int32)
+    for color in (0, 1):
+        mine = (boards != 0) & ((boards >> 3) == color)
+        open_squares = ~_bitboards(boards, mine)
+        knights = _bitboards(boards, mine & (kinds == KNIGHT))
+        for dr, dc in KNIGHT_OFFSETS:
+            counts[:, color] += _popcount(_shift(knights, dr, dc) & open_squares)
+        queens = mine & (kinds == QUEEN)
+        for kind, directions in ((BISHOP, BISHOP_DIRECTIONS), (ROOK, ROOK_DIRECTIONS)):
+            sliders = _bitboards(boards, (mine & (kinds == kind)) | queens)
+            for dr, dc in directions:
+                # Flood through empty squares, then one more step onto the blocker
+                flood = reach = sliders
+                for _ in range(6):
+                    reach = _shift(reach, dr, dc) & empty
+                    flood = flood | reach
+                counts[:, color] += _popcount(_shift(flood, dr, dc) & open_squares)
+    return counts
+
+
+def evaluate_batch(boards, sides=None, mobility_weight=0, mg_tables=None, eg_tables=None):
+    # Integer scores; with sides (0 = White to move) they are from the side to
+    # move's point of view like evaluate(), otherwise from White's. Each move
+    # of mobility advantage is worth mobility_weight centipawns
+    scores = material_pst(boards, mg_tables, eg_tables)
+    if mobility_weight:
+        counts = mobility_counts(boards)
+        scores += mobility_weight * (counts[:, 0] - counts[:, 1])
+    if sides is not None:
+        scores = np.where(np.asarray(sides) == WHITE, scores, -scores)
+    return scores
+
+
+def scalar_mobility(squares):
+    # Reference for mobility_counts: (White, Black) for one board
+    counts = [0, 0]
+    for sq, piece in enumerate(squares):
+        kind = piece & 7
+        if kind == KNIGHT:
+            color = piece >> 3
+            for target in KNIGHT_TARGETS[sq]:
+                if not squares[target] or squares[target] >> 3 != color:
+                    counts[color] += 1
+        elif kind in SLIDER_RAYS:
+            color = piece >> 3
+            for ray in SLIDER_RAYS[kind][sq]:
+                for target in ray:
+                    if squares[target]:
+                        if squares[target] >> 3 != color:
+                            counts[color] += 1
+                        break
+                    counts[color] += 1
+    return counts
+
+
+def scalar_evaluate(squares, mobility_weight=0):
+    # Reference for evaluate_batch: one board at a time, from White's side
+    mg, eg, phase = compute(squares)
+    phase = min(phase, MAX_PHASE)
+    score = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+    if mobility_weight:
+        white, black = scalar_mobility(squares)
+        score += mobility_weight * (white - black)
+    return score
+
+
+def sample_positions(count, seed=0, max_plies=120):
+    # Boards from random playouts, a spread of openings, middlegames and endings
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        pos = Position()
+        for _ in range(max_plies):
+            moves = generate_moves(pos)
+            if not moves:
+                break
+            pos.make(rng.choice(moves))
+            boards.append(bytes(pos.squares))
+            if len(boards) == count:
+                break
+    return boards
+
+
+def benchmark(count=20000, mobility_weight=4, seed=0):
+    # Positions/sec for the scalar and the batch path on the same boards
+    _require_numpy()
+    boards = sample_positions(count, seed)
+    start = time.perf_counter()
+    expected = [scalar_evaluate(squares, mobility_weight) for squares in boards]
+    scalar = time.perf_counter() - start
+    array = to_array(boards)
+    start = time.perf_counter()
+    scores = evaluate_batch(array, mobility_weight=mobility_weight)
+    batch = time.perf_counter() - start
+    if scores.tolist() != expected:
+        raise AssertionError("batch and scalar evaluations differ")
+    start = time.perf_counter()
+    material_pst(array)
+    pst_only = time.perf_counter() - start
+    print(f"{count:,} positions, mobility weight {mobility_weight}")
+    print(f"{'path':<22} {'seconds':>8} {'positions/sec':>14}")
+    print(f"{'scalar':<22} {scalar:>8.3f} {count / scalar:>14,.0f}")
+    print(f"{'batch':<22} {batch:>8.3f} {count / batch:>14,.0f}   {scalar / batch:.0f}x")
+    print(f"{'batch, material+pst':<22} {pst_only:>8.3f} {count / pst_only:>14,.0f}")
+    return scalar, batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch evaluation benchmark")
+    parser.add_argument("--count", type=int, default=20000, help="positions to evaluate")
+    parser.add_argument("--mobility", type=int, default=4, help="centipawns per move of mobility")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if np is None:
+        print("numpy is not installed", file=sys.stderr)
+        return 1
+    benchmark(args.count, args.mobility, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# Polyglot opening book support.
+#
+# A Polyglot book is a flat file of 16-byte big-endian entries
+# (key u64, move u16, weight u16, learn u32) sorted by key, where the key is
+# the Polyglot Zobrist hash of the position. The file is memory-mapped and
+# the entries for a position are found by binary search, so a lookup touches
+# a handful of pages and never reads the whole book.
+#
+#   python book.py --build                 # write book.bin from BOOK_LINES
+#   python book.py --build lines.txt       # one game per line, UCI moves
+#   python book.py --fen "<fen>"           # list the book moves for a position
+#   python book.py --bench                 # lookups per second
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from collections import Counter
+
+from movegen import PAWN_CAPTURES, generate_moves
+from polyglot_keys import RANDOM64
+from position import (
+    BLACK, CASTLE_BK, CASTLE_BQ, CASTLE_ROOK_MOVES, CASTLE_WK, CASTLE_WQ, FLAG_CASTLE,
+    FLAG_PROMOTION, NO_SQUARE, PAWN, WHITE, Position, move_name,
+)
+
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+MAX_WEIGHT = 0xFFFF
+
+CASTLE_OFFSETS = ((CASTLE_WK, 768), (CASTLE_WQ, 769), (CASTLE_BK, 770), (CASTLE_BQ, 771))
+EP_OFFSET = 772
+TURN_OFFSET = 780
+
+# Main lines of common openings, used to build the bundled book.bin
+BOOK_LINES = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1 f8e7 f1e1 b7b5 a4b3 d7d6 c2c3 e8g8",
+    "e2e4 e7e5 g1f3 b8c6 f1b5 g8f6 e1g1 f6e4 d2d4 e4d6 b5c6 d7c6 d4e5 d6f5",
+    "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5 c2c3 g8f6 d2d3 d7d6 e1g1 e8g8",
+    "e2e4 e7e5 g1f3 b8c6 d2d4 e5d4 f3d4 g8f6 d4c6 b7c6 e4e5 d8e7",
+    "e2e4 e7e5 g1f3 g8f6 f3e5 d7d6 e5f3 f6e4 d2d4 d6d5 f1d3 b8c6",
+    "e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3 a7a6 c1e3 e7e5 d4b3 c8e6",
+    "e2e4 c7c5 g1f3 b8c6 d2d4 c5d4 f3d4 g8f6 b1c3 e7e5 d4b5 d7d6 c1g5 a7a6",
+    "e2e4 c7c5 g1f3 e7e6 d2d4 c5d4 f3d4 b8c6 b1c3 d8c7 c1e3 a7a6",
+    "e2e4 c7c5 b1c3 b8c6 g2g3 g7g6 f1g2 f8g7 d2d3 d7d6",
+    "e2e4 e7e6 d2d4 d7d5 b1c3 g8f6 c1g5 f8e7 e4e5 f6d7 g5e7 d8e7",
+    "e2e4 e7e6 d2d4 d7d5 b1d2 c7c5 e4d5 e6d5 g1f3 b8c6 f1b5 f8d6",
+    "e2e4 c7c6 d2d4 d7d5 b1c3 d5e4 c3e4 c8f5 e4g3 f5g6 h2h4 h7h6",
+    "e2e4 c7c6 d2d4 d7d5 e4e5 c8f5 g1f3 e7e6 f1e2 c6c5",
+    "e2e4 d7d5 e4d5 d8d5 b1c3 d5a5 d2d4 g8f6 g1f3 c8f5",
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5 f8e7 e2e3 e8g8 g1f3 b8d7",
+    "d2d4 d7d5 c2c4 c7c6 g1f3 g8f6 b1c3 d5c4 a2a4 c8f5 e2e3 e7e6",
+    "d2d4 d7d5 c2c4 d5c4 g1f3 g8f6 e2e3 e7e6 f1c4 c7c5 e1g1 a7a6",
+    "d2d4 g8f6 c2c4 e7e6 b1c3 f8b4 e2e3 e8g8 f1d3 d7d5 g1f3 c7c5",
+    "d2d4 g8f6 c2c4 e7e6 g1f3 b7b6 g2g3 c8a6 b2b3 f8b4 c1d2 b4e7",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 f8g7 e2e4 d7d6 g1f3 e8g8 f1e2 e7e5 e1g1 b8c6",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 d7d5 c4d5 f6d5 e2e4 d5c3 b2c3 f8g7",
+    "d2d4 g8f6 c2c4 c7c5 d4d5 e7e6 b1c3 e6d5 c4d5 d7d6 e2e4 g7g6",
+    "d2d4 g8f6 g1f3 e7e6 c1f4 c7c5 e2e3 b8c6 c2c3 d7d5",
+    "c2c4 e7e5 b1c3 g8f6 g1f3 b8c6 g2g3 d7d5 c4d5 f6d5 f1g2 d5b6",
+    "c2c4 g8f6 b1c3 e7e6 e2e4 d7d5 e4e5 d5d4",
+    "g1f3 d7d5 g2g3 g8f6 f1g2 c7c6 e1g1 c8g4 d2d3 b8d7",
+]
+
+
+def polyglot_key(pos):
+    key = 0
+    squares = pos.squares
+    for color in (WHITE, BLACK):
+        for sq in pos.pieces[color]:
+            # Polyglot counts kinds as black pawn, white pawn, black knight, ...
+            # and squares from a1, while rows here start at rank 8
+            kind = ((squares[sq] & 7) - 1) * 2 + (color == WHITE)
+            key ^= RANDOM64[64 * kind + 8 * (7 - (sq >> 3)) + (sq & 7)]
+    for right, offset in CASTLE_OFFSETS:
+        if pos.castling & right:
+            key ^= RANDOM64[offset]
+    # The en passant file only counts when a pawn is there to take it
+    if pos.ep != NO_SQUARE:
+        pawn = PAWN | pos.side << 3
+        if any(squares[sq] == pawn for sq in PAWN_CAPTURES[pos.side ^ 1][pos.ep]):
+            key ^= RANDOM64[EP_OFFSET + (pos.ep & 7)]
+    if pos.side == WHITE:
+        key ^= RANDOM64[TURN_OFFSET]
+    return key
+
+
+def encode_book_move(move):
+    # Polyglot writes castling as the king taking its own rook
+    frm, to, flag = move & 63, (move >> 6) & 63, move >> 12
+    if flag == FLAG_CASTLE:
+        to = CASTLE_ROOK_MOVES[to][0]
+    promotion = flag - FLAG_PROMOTION + 1 if flag >= FLAG_PROMOTION else 0
+    return ((to & 7) | (7 - (to >> 3)) << 3 | (frm & 7) << 6 | (7 - (frm >> 3)) << 9
+            | promotion << 12)
+
+
+def parse_uci_move(pos, text):
+    for move in generate_moves(pos):
+        if move_name(move) == text:
+            return move
+    raise ValueError(f"Illegal move {text} in {pos.fen()}")
+
+
+class OpeningBook:
+    def __init__(self, path=DEFAULT_BOOK):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap refuses empty files; an empty book just has no moves
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.count = len(self.data) // ENTRY.size
+        self.lookups = 0
+        self.hits = 0
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b""
+        self.count = 0
+
+    def _first_index(self, key):
+        # Index of the first entry whose key is not below key
+        lo, hi = 0, self.count
+        data = self.data
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(data, mid * ENTRY.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, pos):
+        # (move, weight) for every legal book move in pos, best weight first
+        self.lookups += 1
+        key = polyglot_key(pos)
+        index = self._first_index(key)
+        found = []
+        while index < self.count:
+            entry_key, book_move, weight, _ = ENTRY.unpack_from(self.data, index * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((book_move, weight))
+            index += 1
+        if not found:
+            return []
+        # Map back onto legal moves, which also drops entries from a key collision
+        legal = {encode_book_move(move): move for move in generate_moves(pos)}
+        moves = [(legal[book_move], weight) for book_move, weight in found if book_move in legal]
+        if moves:
+            self.hits += 1
+        return sorted(moves, key=lambda entry: -entry[1])
+
+    def choose(self, pos, rng=random):
+        # A book move picked with probability proportional to its weight, or None
+        moves = [(move, weight) for move, weight in self.entries(pos) if weight]
+        if not moves:
+            return None
+        pick = rng.randrange(sum(weight for _, weight in moves))
+        for move, weight in moves:
+            pick -= weight
+            if pick < 0:
+                return move
+        return moves[-1][0]
+
+
+def open_book(path=DEFAULT_BOOK):
+    # The book is optional: None when the file is missing or unreadable
+    try:
+        return OpeningBook(path)
+    except OSError:
+        return None
+
+
+def build_book(lines, path=DEFAULT_BOOK, max_ply=30):
+    # Every position reached in the given games becomes a book entry; a move
+    # played in several games gets a correspondingly larger weight.
+    counts = Counter()
+    for line in lines:
+        pos = Position()
+        for text in line.split()[:max_ply]:
+            move = parse_uci_move(pos, text)
+            counts[polyglot_key(pos), encode_book_move(move)] += 1
+            pos.make(move)
+    top = max(counts.values(), default=1)
+    scale = max(1, MAX_WEIGHT // (top * 8))
+    entries = sorted(((key, book_move, min(count * scale, MAX_WEIGHT))
+                      for (key, book_move), count in counts.items()),
+                     key=lambda entry: (entry[0], -entry[2]))
+    with open(path, "wb") as f:
+        for key, book_move, weight in entries:
+            f.write(ENTRY.pack(key, book_move, weight, 0))
+    return len(entries)
+
+
+def benchmark(book, seconds=1.0):
+    # Lookups per second over a mix of book and non-book positions
+    positions = [Position()]
+    for text in BOOK_LINES[0].split():
+        pos = positions[-1].copy()
+        pos.make(parse_uci_move(pos, text))
+        positions.append(pos)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for pos in positions:
+            book.entries(pos)
+        count += len(positions)
+    return count / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Polyglot opening book tools")
+    parser.add_argument("--book", default=DEFAULT_BOOK, help="book file to read or write")
+    parser.add_argument("--build", nargs="?", const="", metavar="LINES",
+                        help="write the book from a file of UCI move lines (default: BOOK_LINES)")
+    parser.add_argument("--fen", help="list the book moves for this position")
+    parser.add_argument("--bench", action="store_true", help="measure lookups per second")
+    args = parser.parse_args(argv)
+
+    if args.build is not None:
+        if args.build:
+            with open(args.build) as f:
+                lines = [line for line in f if line.strip()]
+        else:
+            lines = BOOK_LINES
+        count = build_book(lines, args.book)
+        print(f"Wrote {count} entries to {args.book}")
+        return 0
+    book = OpeningBook(args.book)
+    if args.bench:
+        print(f"{benchmark(book):,.0f} lookups/sec over {book.count} entries")
+        return 0
+    pos = Position(args.fen) if args.fen else Position()
+    print(f"key {polyglot_key(pos):016x}")
+    for move, weight in book.entries(pos):
+        print(f"{move_name(move)} {weight}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,36 @@
-import pygame
+import os
 import sys
+
+if __name__ == "__main__" and "--uci" in sys.argv[1:]:
+    # UCI mode talks over stdin/stdout; importing pygame would print its
+    # banner there, so the game modules are never loaded
+    import uci
+    sys.exit(uci.main())
+
+import pygame
+import argparse
 import random
 
-# Initialize pygame
-pygame.init()
+from movegen import generate_moves, in_check
+from position import COLOR_NAMES, TYPE_NAMES, Position, move_flag, move_from, move_name, move_to, square
+from search import DIFFICULTY_LIMITS
+from parallel import SearchPool
+from tt import TranspositionTable
+from worker import SearchWorker
+from assets import AssetManager
+from book import open_book
+from tablebase import Tablebases
+from stats import FrameTimer, JsonLinesLog, profile
 
 # Constants
 WIDTH, HEIGHT = 600, 700  # Extra space for UI
 ROWS, COLS = 8, 8
 SQUARE_SIZE = WIDTH // COLS
+TT_SIZE_MB = 16  # Memory budget for the AI's transposition table
+AI_WORKERS = os.cpu_count() or 1  # Processes for the AI search (--workers); above 1 uses a Lazy SMP pool
+FPS = 30
+PIECE_SET = "classic"  # or "text"; 'T' switches sets during a game
+OVERLAY_REFRESH_MS = 250  # How often the stats overlay text is re-rendered
 
 # Colors
 WHITE = (255, 255, 255)
@@ -16,50 +38,93 @@ BLACK = (0, 0, 0)
 GRAY = (128, 128, 128)
 BROWN = (184, 139, 74)
 LIGHT_BROWN = (227, 193, 111)
+SELECTED = (246, 216, 96)
+TARGET = (70, 90, 50)
 
-# Load piece images
-pieces = {}
-piece_names = [
-    "PawnWhite", "PawnBlack", "RookWhite", "RookBlack", "BishopWhite", "BishopBlack",
-    "KnightWhite", "KnightBlack", "QueenWhite", "QueenBlack", "KingWhite", "KingBlack"
-]
-for name in piece_names:
-    pieces[name] = pygame.image.load(f"{name}.png")
-    pieces[name] = pygame.transform.scale(pieces[name], (SQUARE_SIZE, SQUARE_SIZE))
-    pieces[name] = pygame.transform.rotozoom(pieces[name], 0, 0.8)
-
-# Load move sound
-move_sound = pygame.mixer.Sound("move.mp3")
-
-# Screen setup
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Chess Game")
+# Piece sprites and sounds load on first use; see init_display()
+assets = AssetManager(SQUARE_SIZE, PIECE_SET)
+screen = None
+clock = None
 
 # Board setup
-board = [
-    ["RookBlack", "KnightBlack", "BishopBlack", "QueenBlack", "KingBlack", "BishopBlack", "KnightBlack", "RookBlack"],
-    ["PawnBlack"] * 8,
-    [None] * 8,
-    [None] * 8,
-    [None] * 8,
-    [None] * 8,
-    ["PawnWhite"] * 8,
-    ["RookWhite", "KnightWhite", "BishopWhite", "QueenWhite", "KingWhite", "BishopWhite", "KnightWhite", "RookWhite"]
-]
+position = Position()
+transposition_table = TranspositionTable(TT_SIZE_MB)
+endgame_tables = Tablebases()  # Empty unless tables were built; see tablebase.py
+ai_worker = SearchWorker(transposition_table, tablebases=endgame_tables)  # AI searches off the render thread
+opening_book = open_book()  # None when book.bin is missing
+
+# Instrumentation; see stats.py and the command line options at the bottom
+frame_timer = FrameTimer()
+stats_log = None  # JsonLinesLog of every AI move with --stats
+show_overlay = False  # 'O' toggles the stats overlay
+last_search_stats = None  # Search.stats() of the AI's last searched move
+overlay_surface = None
+overlay_updated = 0
+
+# Legal moves of the side to move, generated once per turn and indexed
+# from square -> to square -> moves (one per piece for a promotion)
+turn_key = None
+turn_moves = []
+turn_index = {}
+selected_square = None  # Square of the player's selected piece
+highlighted = set()  # Where the selected piece may go
+
+# Area below the board holding names, scores and the AI status
+PANEL_RECT = pygame.Rect(0, ROWS * SQUARE_SIZE, WIDTH, HEIGHT - ROWS * SQUARE_SIZE)
 
 # Add global variables for scores and player names
 player_scores = {"Player 1": 0, "Player 2": 0}
 high_scores = []  # List of tuples (name, score)
 player_names = ["Player 1", "Player 2"]
 
+# Fonts and rendered strings are reused until their text changes
+fonts = {}
+text_cache = {}
+
+def get_font(size):
+    font = fonts.get(size)
+    if font is None:
+        font = fonts[size] = pygame.font.Font(None, size)
+    return font
+
+def render_text(text, size, color=WHITE):
+    key = (text, size, color)
+    surface = text_cache.get(key)
+    if surface is None:
+        if len(text_cache) > 256:
+            text_cache.clear()
+        surface = text_cache[key] = get_font(size).render(text, True, color)
+    return surface
+
+def init_display():
+    # Nothing touches the display until the game actually starts
+    global screen, clock
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Chess Game")
+    clock = pygame.time.Clock()
+    assets.atlas()  # Build or load the sprite atlas before the first frame
+
+def draw_square(sq):
+    row, col = divmod(sq, COLS)
+    rect = pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+    color = LIGHT_BROWN if (row + col) % 2 == 0 else BROWN
+    pygame.draw.rect(screen, SELECTED if sq == selected_square else color, rect)
+    piece = position.name_at(row, col)
+    if piece:
+        assets.blit_piece(screen, piece, rect.topleft)
+    if sq in highlighted:
+        # A ring around pieces that can be taken, a dot on empty squares
+        if piece:
+            pygame.draw.circle(screen, TARGET, rect.center, SQUARE_SIZE // 2 - 2, 4)
+        else:
+            pygame.draw.circle(screen, TARGET, rect.center, SQUARE_SIZE // 8)
+    return rect
+
 def draw_board():
-    for row in range(ROWS):
-        for col in range(COLS):
-            color = LIGHT_BROWN if (row + col) % 2 == 0 else BROWN
-            pygame.draw.rect(screen, color, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-            piece = board[row][col]
-            if piece:
-                screen.blit(pieces[piece], (col * SQUARE_SIZE, row * SQUARE_SIZE))
+    for sq in range(ROWS * COLS):
+        draw_square(sq)
 
 def welcome_screen():
     screen.fill(GRAY)
@@ -115,177 +180,136 @@ def choose_color_screen():
                     if rect.collidepoint(event.pos):
                         return color
 
-def ai_move(ai_color):
-    def get_valid_moves(piece, row, col):
-        moves = []
-        if piece == f"Pawn{ai_color}":
-            direction = 1 if ai_color == "Black" else -1
-            start_row = 1 if ai_color == "Black" else 6
-            next_row = row + direction
-            if 0 <= next_row < ROWS and board[next_row][col] is None:
-                moves.append((next_row, col))
-            if row == start_row and board[row + direction][col] is None and board[row + 2 * direction][col] is None:
-                moves.append((row + 2 * direction, col))
-            # Pawn captures
-            for dc in [-1, 1]:
-                capture_row, capture_col = row + direction, col + dc
-                if 0 <= capture_row < ROWS and 0 <= capture_col < COLS:
-                    target = board[capture_row][capture_col]
-                    if target and not target.endswith(ai_color):
-                        moves.append((capture_row, capture_col))
-        elif piece == f"Rook{ai_color}":
-            for i in range(1, ROWS):
-                if row + i < ROWS and (board[row + i][col] is None or (board[row + i][col] and not board[row + i][col].endswith(ai_color))):
-                    moves.append((row + i, col))
-                    if board[row + i][col] is not None:
-                        break
-                else:
-                    break
-            for i in range(1, ROWS):
-                if row - i >= 0 and (board[row - i][col] is None or (board[row - i][col] and not board[row - i][col].endswith(ai_color))):
-                    moves.append((row - i, col))
-                    if board[row - i][col] is not None:
-                        break
-                else:
-                    break
-            for i in range(1, COLS):
-                if col + i < COLS and (board[row][col + i] is None or (board[row][col + i] and not board[row][col + i].endswith(ai_color))):
-                    moves.append((row, col + i))
-                    if board[row][col + i] is not None:
-                        break
-                else:
-                    break
-            for i in range(1, COLS):
-                if col - i >= 0 and (board[row][col - i] is None or (board[row][col - i] and not board[row][col - i].endswith(ai_color))):
-                    moves.append((row, col - i))
-                    if board[row][col - i] is not None:
-                        break
-                else:
-                    break
-        elif piece == f"Knight{ai_color}":
-            knight_moves = [
-                (row + 2, col + 1), (row + 2, col - 1),
-                (row - 2, col + 1), (row - 2, col - 1),
-                (row + 1, col + 2), (row + 1, col - 2),
-                (row - 1, col + 2), (row - 1, col - 2)
-            ]
-            for r, c in knight_moves:
-                if 0 <= r < ROWS and 0 <= c < COLS and (board[r][c] is None or (board[r][c] and not board[r][c].endswith(ai_color))):
-                    moves.append((r, c))
-        elif piece == f"Bishop{ai_color}":
-            for i in range(1, ROWS):
-                if row + i < ROWS and col + i < COLS and (board[row + i][col + i] is None or (board[row + i][col + i] and not board[row + i][col + i].endswith(ai_color))):
-                    moves.append((row + i, col + i))
-                    if board[row + i][col + i] is not None:
-                        break
-                else:
-                    break
-            for i in range(1, ROWS):
-                if row + i < ROWS and col - i >= 0 and (board[row + i][col - i] is None or (board[row + i][col - i] and not board[row + i][col - i].endswith(ai_color))):
-                    moves.append((row + i, col - i))
-                    if board[row + i][col - i] is not None:
-                        break
-                else:
-                    break
-            for i in range(1, ROWS):
-                if row - i >= 0 and col + i < COLS and (board[row - i][col + i] is None or (board[row - i][col + i] and not board[row - i][col + i].endswith(ai_color))):
-                    moves.append((row - i, col + i))
-                    if board[row - i][col + i] is not None:
-                        break
-                else:
-                    break
-            for i in range(1, ROWS):
-                if row - i >= 0 and col - i >= 0 and (board[row - i][col - i] is None or (board[row - i][col - i] and not board[row - i][col - i].endswith(ai_color))):
-                    moves.append((row - i, col - i))
-                    if board[row - i][col - i] is not None:
-                        break
-                else:
-                    break
-        elif piece == f"Queen{ai_color}":
-            moves.extend(get_valid_moves(f"Rook{ai_color}", row, col))
-            moves.extend(get_valid_moves(f"Bishop{ai_color}", row, col))
-        elif piece == f"King{ai_color}":
-            king_moves = [
-                (row + 1, col), (row - 1, col),
-                (row, col + 1), (row, col - 1),
-                (row + 1, col + 1), (row + 1, col - 1),
-                (row - 1, col + 1), (row - 1, col - 1)
-            ]
-            for r, c in king_moves:
-                if 0 <= r < ROWS and 0 <= c < COLS and (board[r][c] is None or (board[r][c] and not board[r][c].endswith(ai_color))):
-                    moves.append((r, c))
-        return moves
-
-    def piece_value(piece):
-        if not piece:
-            return 0
-        if 'King' in piece:
-            return 1000
-        if 'Queen' in piece:
-            return 9
-        if 'Rook' in piece:
-            return 5
-        if 'Bishop' in piece or 'Knight' in piece:
-            return 3
-        if 'Pawn' in piece:
-            return 1
-        return 0
-
-    def is_checkmate_for(color):
-        # Simple check: is king missing?
-        for row in board:
-            for piece in row:
-                if piece == f'King{color}':
-                    return False
-        return True
-
-    best_score = -float('inf')
-    best_move = None
-    ai_pieces = [(r, c) for r in range(ROWS) for c in range(COLS) if board[r][c] and board[r][c].endswith(ai_color)]
-    for row, col in ai_pieces:
-        piece = board[row][col]
-        valid_moves = get_valid_moves(piece, row, col)
-        for move_row, move_col in valid_moves:
-            captured = board[move_row][move_col]
-            # Simulate move
-            temp = board[move_row][move_col]
-            board[move_row][move_col] = board[row][col]
-            board[row][col] = None
-            score = piece_value(captured)
-            # Check for checkmate
-            opponent_color = "White" if ai_color == "Black" else "Black"
-            if is_checkmate_for(opponent_color):
-                score += 10000
-            # Undo move
-            board[row][col] = board[move_row][move_col]
-            board[move_row][move_col] = temp
-            if score > best_score:
-                best_score = score
-                best_move = (row, col, move_row, move_col)
-    if best_move:
-        row, col, move_row, move_col = best_move
-        board[move_row][move_col] = board[row][col]
-        board[row][col] = None
-        move_sound.play()  # Play sound for AI move
+def update_ai(difficulty):
+    # Starts the AI search when its turn begins; returns True once its turn is over
+    global last_search_stats, ai_worker
+    move = None
+    from_book = False
+    if ai_worker.idle():
+        # Book moves are played straight away; the search only runs out of book
+        if opening_book is not None:
+            move = opening_book.choose(position, random)
+            from_book = move is not None
+        if move is None:
+            ai_worker.start(position, **DIFFICULTY_LIMITS[difficulty])
+    if move is None:
+        try:
+            done, move = ai_worker.poll()
+        except Exception as error:
+            if ai_worker.pool is None:
+                raise
+            # A pool process died: carry on with the single-process search,
+            # which starts on the next frame
+            print(f"Parallel search failed ({error!r}), using a single process")
+            ai_worker.pool.close()
+            ai_worker = SearchWorker(transposition_table, tablebases=endgame_tables)
+            return False
+        if not done:
+            return False
+        if move is None:
+            # No legal move: the turn ends and the game over check takes it from here
+            return True
+    if not from_book:
+        last_search_stats = ai_worker.search.stats()
+    if stats_log is not None:
+        record = {"ply": len(position.history) + 1, "move": move_name(move),
+                  "source": "book" if from_book else "search"}
+        if not from_book:
+            record.update(last_search_stats)
+        record.update(frame_timer.stats())
+        stats_log.write(record)
+    position.make(move)
+    assets.play("move")  # Play sound for AI move
+    return True
+
+def display_thinking(depth, nodes):
+    text = render_text(f"{player_names[1]} is thinking... depth {depth}, {nodes:,} nodes", 30)
+    screen.blit(text, (10, HEIGHT - 90))
 
 def display_scores():
-    font = pygame.font.Font(None, 30)
     y_offset = HEIGHT - 100
     # Remove player scores at the bottom left
     # Only display high scores at the bottom right
     high_scores_sorted = sorted(high_scores, key=lambda x: x[1], reverse=True)
     for i, (name, score) in enumerate(high_scores_sorted[:5]):
-        text = font.render(f"{i+1}. {name}: {score}", True, WHITE)
+        text = render_text(f"{i+1}. {name}: {score}", 30)
         screen.blit(text, (WIDTH - 200, y_offset + i * 20))
 
+def panel_state(player_color):
+    # Everything the panel shows; it is only redrawn when this changes
+    thinking = ai_worker.info() if ai_worker.thinking() else None
+    return (tuple(player_names), player_scores.get(player_names[0], 0),
+            player_scores.get(player_names[1], 0), tuple(high_scores), player_color, thinking)
+
+def draw_panel(player_color, thinking):
+    screen.fill(BLACK, PANEL_RECT)
+    display_scores()  # Display high scores on the screen
+
+    # Display player and AI names with their scores at the bottom left
+    player_score = player_scores.get(player_names[0], 0)
+    ai_score = player_scores.get(player_names[1], 0)
+    screen.blit(render_text(f"{player_names[0]} (You): {player_score}", 30), (10, HEIGHT - 60))
+    screen.blit(render_text(f"{player_names[1]} (AI): {ai_score}", 30), (10, HEIGHT - 30))
+
+    # Display player color at the bottom center
+    color_text = render_text(f"You are: {player_color}", 30)
+    screen.blit(color_text, (WIDTH // 2 - color_text.get_width() // 2, HEIGHT - 30))
+
+    if thinking:
+        display_thinking(*thinking)
+
+def overlay_lines():
+    frame = frame_timer.stats()
+    lines = [f"frame {frame['frame_ms_avg']:.1f} ms avg, {frame['frame_ms_max']:.1f} max, {clock.get_fps():.0f} fps"]
+    stats = last_search_stats
+    if stats is None:
+        lines.append("no search yet")
+        return lines
+    branching = stats.get("branching_factor")
+    lines.append(f"depth {stats['depth']}, {stats['nodes']:,} nodes, {stats['nps']:,} nps")
+    lines.append(f"qnodes {stats.get('qnodes', 0) / max(stats['nodes'], 1):.0%}, "
+                 f"tt hits {stats.get('tt_hit_rate', 0):.0%}, pawn hits {stats.get('pawn_hit_rate', 0):.0%}")
+    lines.append(f"cutoffs {stats.get('cutoffs', 0):,} ({stats.get('first_move_cutoff_rate', 0):.0%} first), "
+                 f"branching {branching if branching is not None else '-'}")
+    lines.append("ms per depth: " + " ".join(f"{it['ms']:.0f}" for it in stats.get("iterations", [])[-8:]))
+    return lines
+
+def draw_overlay():
+    # Translucent stats box over the top left of the board; the text is only
+    # re-rendered a few times a second
+    global overlay_surface, overlay_updated
+    now = pygame.time.get_ticks()
+    if overlay_surface is None or now - overlay_updated >= OVERLAY_REFRESH_MS:
+        lines = [get_font(22).render(line, True, WHITE) for line in overlay_lines()]
+        overlay_surface = pygame.Surface((max(line.get_width() for line in lines) + 12, len(lines) * 18 + 8),
+                                         pygame.SRCALPHA)
+        overlay_surface.fill((0, 0, 0, 180))
+        for i, line in enumerate(lines):
+            overlay_surface.blit(line, (6, 4 + i * 18))
+        overlay_updated = now
+    # Squares underneath are redrawn first so the box does not darken frame by frame
+    rows = min(overlay_surface.get_height() // SQUARE_SIZE + 1, ROWS)
+    cols = min(overlay_surface.get_width() // SQUARE_SIZE + 1, COLS)
+    for row in range(rows):
+        for col in range(cols):
+            draw_square(square(row, col))
+    screen.blit(overlay_surface, (0, 0))
+    return pygame.Rect(0, 0, cols * SQUARE_SIZE, rows * SQUARE_SIZE)
+
+def show_result(message):
+    text = render_text(message, 60)
+    screen.blit(text, (WIDTH // 2 - 100, HEIGHT // 2))
+    pygame.display.update()
+    pygame.time.delay(3000)
+
 def pause_game():
     paused = True
-    font = pygame.font.Font(None, 40)
-    text = font.render("Game Paused. Press 'P' to resume.", True, WHITE)
+    text = render_text("Game Paused. Press 'P' to resume.", 40)
     screen.blit(text, (WIDTH // 2 - 150, HEIGHT // 2))
     pygame.display.update()
 
     while paused:
+        clock.tick(FPS)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -332,14 +356,63 @@ def rename_players():
                         player_names[i] = name if name else f"Player {i+1}"
                         return
 
+def legal_moves_index():
+    # Regenerated only when the position has changed since the last call, so
+    # clicks, highlights and the game over checks share one generation a turn
+    global turn_key, turn_moves, turn_index
+    key = (position.hash, len(position.history))
+    if key != turn_key:
+        turn_moves = generate_moves(position)
+        turn_index = {}
+        for move in turn_moves:
+            targets = turn_index.setdefault(move_from(move), {})
+            targets.setdefault(move_to(move), []).append(move)
+        turn_key = key
+    return turn_index
+
+def select_square(sq):
+    # Selects the piece on sq (None clears) and the squares it can move to
+    global selected_square, highlighted
+    selected_square = sq
+    highlighted = set(legal_moves_index().get(sq, ())) if sq is not None else set()
+
 def is_king_mated(color):
-    # Use correct piece names for king
-    king_piece = f"King{color}"
-    for row in board:
-        for piece in row:
-            if piece == king_piece:
-                return False
-    return True
+    # Mated: it is this side's turn, its king is attacked and no legal move helps
+    legal_moves_index()
+    return COLOR_NAMES[position.side] == color and not turn_moves and in_check(position)
+
+def is_stalemate():
+    legal_moves_index()
+    return not turn_moves and not in_check(position)
+
+def choose_promotion(moves, to):
+    # Lets the player pick the promotion piece next to the promotion square;
+    # returns the move, or None when dismissed
+    color = COLOR_NAMES[position.side]
+    row, col = divmod(to, COLS)
+    x = min(col * SQUARE_SIZE, WIDTH - len(moves) * SQUARE_SIZE)
+    options = []
+    for i, move in enumerate(sorted(moves, key=move_flag, reverse=True)):  # Queen first
+        rect = pygame.Rect(x + i * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+        pygame.draw.rect(screen, GRAY, rect)
+        pygame.draw.rect(screen, BLACK, rect, 2)
+        assets.blit_piece(screen, TYPE_NAMES[move_flag(move) - 2] + color, rect.topleft)
+        options.append((rect, move))
+    pygame.display.update()
+
+    while True:
+        clock.tick(FPS)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                return None
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                for rect, move in options:
+                    if rect.collidepoint(event.pos):
+                        return move
+                return None
 
 def play_again_prompt():
     screen.fill(GRAY)
@@ -408,18 +481,11 @@ def chess_manual_screen():
                 if button_rect.collidepoint(event.pos):
                     return
 
-def main():
-    initial_board = [
-        ["RookBlack", "KnightBlack", "BishopBlack", "QueenBlack", "KingBlack", "BishopBlack", "KnightBlack", "RookBlack"],
-        ["PawnBlack"] * 8,
-        [None] * 8,
-        [None] * 8,
-        [None] * 8,
-        [None] * 8,
-        ["PawnWhite"] * 8,
-        ["RookWhite", "KnightWhite", "BishopWhite", "QueenWhite", "KingWhite", "BishopWhite", "KnightWhite", "RookWhite"]
-    ]
-    global board
+def main(workers=AI_WORKERS):
+    global position, ai_worker, show_overlay
+    init_display()
+    if workers > 1:
+        ai_worker = SearchWorker(pool=SearchPool(workers, TT_SIZE_MB))
     chess_manual_screen()
     rename_players()
     difficulty = welcome_screen()
@@ -427,8 +493,8 @@ def main():
     ai_color = "Black" if player_color == "White" else "White"
     print(f"Game started with {difficulty} difficulty, Player: {player_names[0]} ({player_color}), AI: {player_names[1]} ({ai_color})")
     while True:
-        board = [row[:] for row in initial_board]
-        selected_piece = None
+        position = Position()
+        select_square(None)
         running = True
         # AI always plays from the top (Black pieces), player always at the bottom (White pieces)
         if player_color == "White":
@@ -438,80 +504,116 @@ def main():
             player_turn = False
         winner = None  # Track winner
 
-        # If player chose Black, let AI (White) make the first move
-        if player_color == "Black":
-            ai_color = "White"
-            ai_move(ai_color)  # AI as White moves first
-            player_turn = True
+        board_drawn = None  # Squares as last drawn; None forces a full redraw
+        panel_drawn = None
+        highlight_drawn = None
+        check_game_over = True  # Mate and stalemate only need checking after a move
 
         while running:
-            screen.fill(BLACK)
-            draw_board()
-            display_scores()  # Display high scores on the screen
-
-            # Display player and AI names with their scores at the bottom left
-            font = pygame.font.Font(None, 30)
-            player_score = player_scores.get(player_names[0], 0)
-            ai_score = player_scores.get(player_names[1], 0)
-            player_text = font.render(f"{player_names[0]} (You): {player_score}", True, WHITE)
-            ai_text = font.render(f"{player_names[1]} (AI): {ai_score}", True, WHITE)
-            screen.blit(player_text, (10, HEIGHT - 60))
-            screen.blit(ai_text, (10, HEIGHT - 30))
-
-            # Display player color at the bottom center
-            color_text = font.render(f"You are: {player_color}", True, WHITE)
-            screen.blit(color_text, (WIDTH // 2 - color_text.get_width() // 2, HEIGHT - 30))
-
-            # Check if the player's king is mated
-            if is_king_mated(player_color):
-                font = pygame.font.Font(None, 60)
-                text = font.render("You Lose!", True, WHITE)
-                screen.blit(text, (WIDTH // 2 - 100, HEIGHT // 2))
-                pygame.display.update()
-                pygame.time.delay(3000)
-                running = False
-                winner = player_names[1]  # AI wins
-                continue
-
-            # Check if the AI's king is mated
-            if is_king_mated(ai_color):
-                font = pygame.font.Font(None, 60)
-                text = font.render("You Win!", True, WHITE)
-                screen.blit(text, (WIDTH // 2 - 100, HEIGHT // 2))
-                pygame.display.update()
-                pygame.time.delay(3000)
-                running = False
-                winner = player_names[0]  # Player wins
-                continue
+            frame_timer.begin()
+            # Only squares whose piece changed since the last frame are redrawn
+            dirty = []
+            if board_drawn is None:
+                screen.fill(BLACK)
+                draw_board()
+                dirty.append(screen.get_rect())
+                panel_drawn = None
+                highlight_drawn = None
+            elif position.squares != board_drawn:
+                for sq, piece in enumerate(position.squares):
+                    if piece != board_drawn[sq]:
+                        dirty.append(draw_square(sq))
+            board_drawn = bytes(position.squares)
+
+            # A new selection redraws the squares it highlights or clears
+            highlight = (selected_square, frozenset(highlighted))
+            if highlight != highlight_drawn:
+                if highlight_drawn is not None:
+                    changed = {highlight[0], highlight_drawn[0]} | highlight[1] | highlight_drawn[1]
+                    for sq in changed - {None}:
+                        dirty.append(draw_square(sq))
+                highlight_drawn = highlight
+
+            panel = panel_state(player_color)
+            if panel != panel_drawn:
+                draw_panel(player_color, panel[-1])
+                dirty.append(PANEL_RECT)
+                panel_drawn = panel
+
+            if check_game_over:
+                check_game_over = False
+                # Check if the player's king is mated
+                if is_king_mated(player_color):
+                    show_result("You Lose!")
+                    running = False
+                    winner = player_names[1]  # AI wins
+                    continue
 
-            pygame.display.update()
+                # Check if the AI's king is mated
+                if is_king_mated(ai_color):
+                    show_result("You Win!")
+                    running = False
+                    winner = player_names[0]  # Player wins
+                    continue
+
+                # Nobody can move but nobody is in check: a draw
+                if is_stalemate():
+                    show_result("Stalemate!")
+                    running = False
+                    continue
+
+            if show_overlay:
+                dirty.append(draw_overlay())
 
-            if not player_turn:
-                pygame.time.delay(500)
-                ai_move(ai_color)
-                move_sound.play()  # Play sound for AI move
+            if dirty:
+                pygame.display.update(dirty)
+            frame_timer.end()
+            clock.tick(FPS)
+
+            # The AI thinks in the background while events keep being handled
+            if not player_turn and update_ai(difficulty):
                 player_turn = True
-                continue
+                check_game_over = True
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    ai_worker.cancel()
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_p:
+                        ai_worker.cancel()  # Restarted on resume if it is the AI's turn
                         pause_game()  # Pause the game
-                elif event.type == pygame.MOUSEBUTTONDOWN:
+                        board_drawn = None
+                    elif event.key == pygame.K_t:
+                        # Switch between the picture and lettered piece sets
+                        assets.set_piece_set("text" if assets.piece_set == "classic" else "classic")
+                        board_drawn = None
+                    elif event.key == pygame.K_o:
+                        show_overlay = not show_overlay
+                        board_drawn = None  # Clears the overlay when it is switched off
+                elif event.type == pygame.MOUSEBUTTONDOWN and player_turn:
                     x, y = event.pos
                     row, col = y // SQUARE_SIZE, x // SQUARE_SIZE
                     if 0 <= row < 8 and 0 <= col < 8:
-                        if selected_piece:
-                            board[row][col] = board[selected_piece[0]][selected_piece[1]]
-                            board[selected_piece[0]][selected_piece[1]] = None
-                            move_sound.play()  # Play sound for player move
-                            player_turn = False
-                            selected_piece = None
+                        sq = square(row, col)
+                        index = legal_moves_index()
+                        moves = index.get(selected_square, {}).get(sq)
+                        if moves:
+                            move = moves[0]
+                            if len(moves) > 1:
+                                move = choose_promotion(moves, sq)
+                                board_drawn = None  # The picker covered part of the board
+                            select_square(None)
+                            if move is not None:
+                                position.make(move)
+                                assets.play("move")  # Play sound for player move
+                                player_turn = False
+                                check_game_over = True
+                        elif sq in index and sq != selected_square:
+                            # Only pieces with a legal move can be picked up
+                            select_square(sq)
                         else:
-                            if board[row][col] and player_color in board[row][col]:
-                                selected_piece = (row, col)
+                            select_square(None)
 
         # Add a point to the winner before asking to play again
         if winner:
@@ -523,5 +625,23 @@ def main():
     pygame.quit()
     sys.exit()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Play chess against the computer")
+    parser.add_argument("--overlay", action="store_true",
+                        help="start with the frame time and search stats overlay shown ('O' toggles it)")
+    parser.add_argument("--stats", metavar="PATH", help="append the search stats of every AI move to PATH as JSON lines")
+    parser.add_argument("--profile", metavar="PATH", help="run the game under cProfile and write the stats to PATH")
+    parser.add_argument("--workers", type=int, default=AI_WORKERS,
+                        help="processes for the AI search; 1 searches on a single thread")
+    parser.add_argument("--uci", action="store_true", help="run as a UCI engine on stdin/stdout instead of the game")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    show_overlay = args.overlay
+    if args.stats:
+        stats_log = JsonLinesLog(args.stats)
+    if args.profile:
+        profile(main, args.profile, args.workers)
+    else:
+        main(args.workers)
\ No newline at end of file
@@ -0,0 +1,252 @@
+# Legal move generation for the engine.
+#
+# Everything that only depends on the square is computed once at import time:
+# knight and king targets, pawn pushes and captures, and the ray of squares a
+# slider walks in each direction. Checkers and pinned pieces are found once per
+# call by walking the rays out from the king, and moves are filtered against
+# them instead of being played and tested.
+
+import time
+
+from position import (
+    BISHOP, CASTLE_BK, CASTLE_BQ, CASTLE_WK, CASTLE_WQ, FLAG_CASTLE, FLAG_EN_PASSANT,
+    FLAG_PROMOTION, KING, KNIGHT, NO_SQUARE, PAWN, QUEEN, ROOK, Position,
+)
+
+KNIGHT_OFFSETS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+KING_OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+def _targets(sq, offsets):
+    row, col = sq >> 3, sq & 7
+    return tuple((row + dr) * 8 + col + dc for dr, dc in offsets
+                 if 0 <= row + dr < 8 and 0 <= col + dc < 8)
+
+
+def _ray(sq, dr, dc):
+    row, col = (sq >> 3) + dr, (sq & 7) + dc
+    ray = []
+    while 0 <= row < 8 and 0 <= col < 8:
+        ray.append(row * 8 + col)
+        row, col = row + dr, col + dc
+    return tuple(ray)
+
+
+KNIGHT_TARGETS = [_targets(sq, KNIGHT_OFFSETS) for sq in range(64)]
+KING_TARGETS = [_targets(sq, KING_OFFSETS) for sq in range(64)]
+
+# RAYS[sq][d] lists the squares in direction DIRECTIONS[d] from sq, nearest first
+RAYS = [[_ray(sq, dr, dc) for dr, dc in DIRECTIONS] for sq in range(64)]
+# Non-empty rays per slider type, so the generator never walks off the board
+SLIDER_RAYS = {
+    BISHOP: [tuple(ray for ray in RAYS[sq][4:] if ray) for sq in range(64)],
+    ROOK: [tuple(ray for ray in RAYS[sq][:4] if ray) for sq in range(64)],
+    QUEEN: [tuple(ray for ray in RAYS[sq] if ray) for sq in range(64)],
+}
+
+PAWN_DIRECTION = (-8, 8)
+PAWN_START_ROW = (6, 1)
+PAWN_CAPTURES = [[_targets(sq, ((-1, -1), (-1, 1))) for sq in range(64)],
+                 [_targets(sq, ((1, -1), (1, 1))) for sq in range(64)]]
+
+
+PROMOTION_ROW = (0, 7)
+
+# (right, king from, king to, squares that must be empty, squares that must not be attacked)
+CASTLING = (
+    (CASTLE_WK, 60, 62, (61, 62), (61, 62)),
+    (CASTLE_WQ, 60, 58, (57, 58, 59), (58, 59)),
+    (CASTLE_BK, 4, 6, (5, 6), (5, 6)),
+    (CASTLE_BQ, 4, 2, (1, 2, 3), (2, 3)),
+)
+
+
+def is_attacked(squares, sq, by):
+    # True if any piece of color `by` attacks sq
+    bits = by << 3
+    pawn = PAWN | bits
+    for s in PAWN_CAPTURES[by ^ 1][sq]:
+        if squares[s] == pawn:
+            return True
+    knight = KNIGHT | bits
+    for s in KNIGHT_TARGETS[sq]:
+        if squares[s] == knight:
+            return True
+    king = KING | bits
+    for s in KING_TARGETS[sq]:
+        if squares[s] == king:
+            return True
+    queen = QUEEN | bits
+    rook = ROOK | bits
+    for ray in SLIDER_RAYS[ROOK][sq]:
+        for s in ray:
+            piece = squares[s]
+            if piece:
+                if piece == rook or piece == queen:
+                    return True
+                break
+    bishop = BISHOP | bits
+    for ray in SLIDER_RAYS[BISHOP][sq]:
+        for s in ray:
+            piece = squares[s]
+            if piece:
+                if piece == bishop or piece == queen:
+                    return True
+                break
+    return False
+
+
+def in_check(pos):
+    return is_attacked(pos.squares, pos.kings[pos.side], pos.side ^ 1)
+
+
+def generate_moves(pos, buf=None):
+    # Fills buf (reused between calls when given) with the legal moves
+    if buf is None:
+        buf = []
+    else:
+        buf.clear()
+    add = buf.append
+    side = pos.side
+    opp = side ^ 1
+    squares = pos.squares
+    king = pos.kings[side]
+
+    # Walk the eight rays out of the king square. The first enemy slider that
+    # can move along a ray either gives check (nothing in between) or pins
+    # the single friendly piece in between.
+    checks = 0
+    evasions = ()
+    pinned = {}
+    for d, ray in enumerate(RAYS[king]):
+        slider = BISHOP if d >= 4 else ROOK
+        blocker = NO_SQUARE
+        for i, sq in enumerate(ray):
+            piece = squares[sq]
+            if not piece:
+                continue
+            if piece >> 3 == side:
+                if blocker != NO_SQUARE:
+                    break
+                blocker = sq
+                continue
+            if piece & 7 == slider or piece & 7 == QUEEN:
+                if blocker == NO_SQUARE:
+                    checks += 1
+                    evasions = ray[:i + 1]
+                else:
+                    pinned[blocker] = ray[:i + 1]
+            break
+    enemy_knight = KNIGHT | opp << 3
+    for sq in KNIGHT_TARGETS[king]:
+        if squares[sq] == enemy_knight:
+            checks += 1
+            evasions = (sq,)
+    enemy_pawn = PAWN | opp << 3
+    for sq in PAWN_CAPTURES[side][king]:
+        if squares[sq] == enemy_pawn:
+            checks += 1
+            evasions = (sq,)
+
+    # King moves, tested with the king lifted off the board so it cannot hide
+    # behind itself on a checking ray
+    squares[king] = 0
+    for to in KING_TARGETS[king]:
+        target = squares[to]
+        if (not target or target >> 3 != side) and not is_attacked(squares, to, opp):
+            add(king | to << 6)
+    squares[king] = KING | side << 3
+    if checks > 1:
+        return buf
+
+    if not checks and pos.castling:
+        for right, frm, to, empty, safe in CASTLING:
+            if (pos.castling & right and frm == king
+                    and all(not squares[sq] for sq in empty)
+                    and not any(is_attacked(squares, sq, opp) for sq in safe)):
+                add(frm | to << 6 | FLAG_CASTLE << 12)
+
+    direction = PAWN_DIRECTION[side]
+    for frm in pos.pieces[side]:
+        kind = squares[frm] & 7
+        if kind == KING:
+            continue
+        allowed = pinned.get(frm)
+        if checks:
+            allowed = evasions if allowed is None else ()
+        start = len(buf)
+        if kind == PAWN:
+            to = frm + direction
+            if not squares[to]:
+                add(frm | to << 6)
+                if frm >> 3 == PAWN_START_ROW[side] and not squares[to + direction]:
+                    add(frm | (to + direction) << 6)
+            for to in PAWN_CAPTURES[side][frm]:
+                target = squares[to]
+                if target and target >> 3 != side:
+                    add(frm | to << 6)
+        elif kind == KNIGHT:
+            for to in KNIGHT_TARGETS[frm]:
+                target = squares[to]
+                if not target or target >> 3 != side:
+                    add(frm | to << 6)
+        else:
+            for ray in SLIDER_RAYS[kind][frm]:
+                for to in ray:
+                    target = squares[to]
+                    if target:
+                        if target >> 3 != side:
+                            add(frm | to << 6)
+                        break
+                    add(frm | to << 6)
+        if allowed is not None:
+            buf[start:] = [move for move in buf[start:] if move >> 6 in allowed]
+        if kind == PAWN and (frm + direction) >> 3 == PROMOTION_ROW[side]:
+            promotions = [move | flag << 12 for move in buf[start:]
+                          for flag in range(FLAG_PROMOTION + 3, FLAG_PROMOTION - 1, -1)]
+            buf[start:] = promotions
+
+    # En passant can uncover a check along the rank through both pawns, so it
+    # is the one move verified by trying it on the board.
+    ep = pos.ep
+    if ep != NO_SQUARE:
+        captured_sq = ep - direction
+        for frm in PAWN_CAPTURES[opp][ep]:
+            if squares[frm] == PAWN | side << 3:
+                squares[frm] = 0
+                squares[captured_sq] = 0
+                squares[ep] = PAWN | side << 3
+                if not is_attacked(squares, king, opp):
+                    add(frm | ep << 6 | FLAG_EN_PASSANT << 12)
+                squares[ep] = 0
+                squares[captured_sq] = enemy_pawn
+                squares[frm] = PAWN | side << 3
+    return buf
+
+
+BENCH_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+
+def benchmark(seconds=2.0):
+    # Moves generated per second over a fixed set of positions
+    positions = [Position(fen) for fen in BENCH_FENS]
+    buf = []
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            for pos in positions:
+                count += len(generate_moves(pos, buf))
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print(f"{benchmark():,.0f} moves/sec")
@@ -0,0 +1,204 @@
+# Lazy SMP parallel search across a process pool.
+# Every worker process searches the same position and they all share one
+# transposition table in shared memory. The helpers' results show up as extra
+# cutoffs and better move ordering for the main worker. The main worker owns
+# the budget and signals the helpers to stop when it finishes.
+#
+#   python parallel.py --bench --workers 1 2 4 --depth 5
+
+import argparse
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from pawns import PawnTable
+from position import Position, move_name
+from search import MAX_PLY, Search
+from tablebase import Tablebases
+from tt import TranspositionTable, table_bytes
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def _init_worker(shm_name, tt_mb, stop_event, progress):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["tt"] = TranspositionTable(tt_mb, buffer=shm.buf)
+    _worker["stop"] = stop_event
+    _worker["progress"] = progress
+    _worker["tablebases"] = Tablebases()  # whatever tables are installed
+    _worker["pawns"] = PawnTable()
+
+
+def _report_progress(search):
+    progress = _worker["progress"]
+    progress[0] = search.depth_reached
+    progress[1] = search.nodes
+
+
+def _search_task(fen, limits, helper, age):
+    tt = _worker["tt"]
+    # Every process keeps its own copy of the age; Search.search() advances
+    # it by one, so all workers end up writing the same generation.
+    tt.age = (age - 1) & 63
+    search = Search(tt=tt, stop_event=_worker["stop"], helper=helper, tablebases=_worker["tablebases"],
+                    pawn_table=_worker["pawns"], on_iteration=None if helper else _report_progress, **limits)
+    move = search.search(Position(fen))
+    return move, search.best_score, search.depth_reached, search.nodes, search.pv, search.stats()
+
+
+class SearchPool:
+    # Long-lived worker processes plus the shared table; create once per game
+    def __init__(self, workers=None, tt_mb=16):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.tt_mb = tt_mb
+        context = multiprocessing.get_context()
+        self.shm = shared_memory.SharedMemory(create=True, size=table_bytes(tt_mb))
+        self.tt = TranspositionTable(tt_mb, buffer=self.shm.buf)
+        self.stop_event = context.Event()
+        self.progress = context.Array("q", 2, lock=False)  # main worker's depth, nodes
+        self.age = 0
+        self.executor = ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=_init_worker,
+            initargs=(self.shm.name, tt_mb, self.stop_event, self.progress))
+        atexit.register(self.close)
+
+    def close(self):
+        if self.executor is None:
+            return
+        self.stop_event.set()
+        self.executor.shutdown()
+        self.executor = None
+        self.tt = None  # drop the views into shared memory before closing it
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ParallelSearch:
+    # Same interface as search.Search, backed by a SearchPool
+    def __init__(self, pool, depth=MAX_PLY, nodes=None, time_ms=None):
+        self.pool = pool
+        self.max_depth = min(depth, MAX_PLY)
+        self.max_nodes = nodes
+        self.time_ms = time_ms
+        self.best_move = None
+        self.best_score = 0
+        self.depth_reached = 0
+        self.pv = []
+        self.total_nodes = 0
+        self.stopped = False
+        self.main_stats = {}
+
+    @property
+    def current_depth(self):
+        return self.pool.progress[0] + 1
+
+    @property
+    def nodes(self):
+        return self.total_nodes or self.pool.progress[1]
+
+    def stop(self):
+        self.stopped = True
+        self.pool.stop_event.set()
+
+    def search(self, pos):
+        pool = self.pool
+        pool.stop_event.clear()
+        if self.stopped:
+            pool.stop_event.set()
+        pool.progress[0] = pool.progress[1] = 0
+        pool.age = (pool.age + 1) & 63
+        fen = pos.fen()
+        limits = {"depth": self.max_depth, "nodes": self.max_nodes, "time_ms": self.time_ms}
+        futures = [pool.executor.submit(_search_task, fen, limits, 0, pool.age)]
+        # Helpers have no budget of their own: they run until the main worker is done
+        futures += [pool.executor.submit(_search_task, fen, {"depth": self.max_depth}, helper, pool.age)
+                    for helper in range(1, pool.workers)]
+        try:
+            main_result = futures[0].result()
+        finally:
+            pool.stop_event.set()
+        results = [main_result] + [future.result() for future in futures[1:]]
+        # Keep the main worker's move unless a helper completed a deeper iteration
+        best = main_result
+        for result in results[1:]:
+            if result[0] is not None and result[2] > best[2]:
+                best = result
+        self.best_move, self.best_score, self.depth_reached, _, self.pv, _ = best
+        self.total_nodes = sum(result[3] for result in results)
+        self.main_stats = main_result[5]
+        return self.best_move
+
+    def stats(self):
+        # The main worker's counters, with the result and node total of the pool
+        stats = dict(self.main_stats)
+        stats.update(depth=self.depth_reached, score=self.best_score, pv=[move_name(move) for move in self.pv],
+                     nodes=self.total_nodes, workers=self.pool.workers)
+        if stats.get("ms"):
+            stats["nps"] = round(self.total_nodes / stats["ms"] * 1000)
+        return stats
+
+
+BENCH_FENS = [
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+
+def benchmark(worker_counts, depth, tt_mb=16):
+    # Time to reach a fixed depth on each bench position, per worker count
+    rows = []
+    for workers in worker_counts:
+        pool = SearchPool(workers, tt_mb)
+        try:
+            # Start the worker processes before timing anything
+            ParallelSearch(pool, depth=1).search(Position())
+            elapsed = 0.0
+            nodes = 0
+            for fen in BENCH_FENS:
+                pool.tt.clear()
+                search = ParallelSearch(pool, depth=depth)
+                start = time.perf_counter()
+                search.search(Position(fen))
+                elapsed += time.perf_counter() - start
+                nodes += search.nodes
+        finally:
+            pool.close()
+        rows.append((workers, elapsed, nodes))
+    base = rows[0][1]
+    print(f"{'workers':>7} {'seconds':>9} {'nodes':>12} {'nps':>10} {'speedup':>8}")
+    for workers, elapsed, nodes in rows:
+        print(f"{workers:>7} {elapsed:>9.2f} {nodes:>12,} {nodes / elapsed:>10,.0f} {base / elapsed:>7.2f}x")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lazy SMP search over a process pool")
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--time-ms", type=int, help="search budget for a single --fen search")
+    parser.add_argument("--hash", type=int, default=16, help="shared table size in MB")
+    parser.add_argument("--fen", help="search one position instead of running the benchmark")
+    parser.add_argument("--bench", action="store_true", help="print the speedup curve by worker count")
+    args = parser.parse_args(argv)
+
+    if args.bench or not args.fen:
+        benchmark(args.workers, args.depth, args.hash)
+        return
+    pool = SearchPool(args.workers[0], args.hash)
+    try:
+        search = ParallelSearch(pool, depth=args.depth, time_ms=args.time_ms)
+        move = search.search(Position(args.fen))
+        print(f"bestmove {move_name(move) if move else '(none)'} score {search.best_score} "
+              f"depth {search.depth_reached} nodes {search.nodes} pv {' '.join(map(move_name, search.pv))}")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
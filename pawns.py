@@ -0,0 +1,166 @@
+# Pawn structure evaluation and the pawn hash table that caches it.
+#
+# Doubled, isolated and passed pawns depend on nothing but where the pawns
+# stand, and pawns move far less often than pieces, so the scores are cached
+# under Position.pawn_hash, a Zobrist key over the pawns alone. Entries also
+# keep the passed pawn mask, which evaluate() uses for the terms that do
+# depend on the other pieces.
+#
+#   python pawns.py              # hit rate and pawn eval time over a search
+#   python pawns.py --depth 5
+
+import argparse
+import time
+from array import array
+
+PAWN = 1
+WHITE, BLACK = 0, 1
+
+# (mg, eg) per pawn, from White's side before the sign is applied
+DOUBLED = (-11, -28)
+ISOLATED = (-6, -14)
+# Passed pawn bonus by rank counted from the pawn's own side (0 = first rank)
+PASSED_MG = (0, 0, 4, 10, 20, 35, 60, 0)
+PASSED_EG = (0, 6, 12, 22, 38, 62, 100, 0)
+
+
+def _span(sq, color, files):
+    # Bit mask of the squares ahead of sq on the given file offsets
+    row, col = sq >> 3, sq & 7
+    step = -1 if color == WHITE else 1
+    mask = 0
+    row += step
+    while 0 <= row < 8:
+        for offset in files:
+            if 0 <= col + offset < 8:
+                mask |= 1 << (row * 8 + col + offset)
+        row += step
+    return mask
+
+
+# FRONT_SPAN[color][sq]: squares in front of a pawn on its own file;
+# PASSED_SPAN adds both neighbouring files, where enemy pawns stop a passer
+FRONT_SPAN = [[_span(sq, color, (0,)) for sq in range(64)] for color in (WHITE, BLACK)]
+PASSED_SPAN = [[_span(sq, color, (-1, 0, 1)) for sq in range(64)] for color in (WHITE, BLACK)]
+
+
+def evaluate_pawns(squares):
+    # (mg, eg, passed) from White's side; passed has a bit set per passed pawn
+    pawns = ([], [])
+    bits = [0, 0]
+    files = [[0] * 8, [0] * 8]
+    for sq, piece in enumerate(squares):
+        if piece & 7 == PAWN:
+            color = piece >> 3
+            pawns[color].append(sq)
+            bits[color] |= 1 << sq
+            files[color][sq & 7] += 1
+    mg = eg = 0
+    passed = 0
+    for color in (WHITE, BLACK):
+        sign = 1 if color == WHITE else -1
+        own_files = files[color]
+        enemy = bits[color ^ 1]
+        own = bits[color]
+        front = FRONT_SPAN[color]
+        passed_span = PASSED_SPAN[color]
+        for file in range(8):
+            if own_files[file] > 1:
+                mg += sign * DOUBLED[0] * (own_files[file] - 1)
+                eg += sign * DOUBLED[1] * (own_files[file] - 1)
+        for sq in pawns[color]:
+            file = sq & 7
+            if not (file > 0 and own_files[file - 1]) and not (file < 7 and own_files[file + 1]):
+                mg += sign * ISOLATED[0]
+                eg += sign * ISOLATED[1]
+            if not passed_span[sq] & enemy and not front[sq] & own:
+                rank = 7 - (sq >> 3) if color == WHITE else sq >> 3
+                mg += sign * PASSED_MG[rank]
+                eg += sign * PASSED_EG[rank]
+                passed |= 1 << sq
+    return mg, eg, passed
+
+
+class PawnTable:
+    # Fixed-size, always-replace cache of evaluate_pawns() keyed by pawn hash
+    def __init__(self, entries=1 << 14):
+        size = 1
+        while size * 2 <= entries:
+            size *= 2
+        self.mask = size - 1
+        self.keys = array("Q", bytes(8 * size))
+        self.scores = array("i", bytes(8 * size))  # mg, eg pairs
+        self.passed = array("Q", bytes(8 * size))
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.replacements = 0
+
+    def probe(self, pos):
+        # (mg, eg, passed) for the pawns of pos, computed on a miss
+        self.probes += 1
+        key = pos.pawn_hash
+        index = key & self.mask
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[2 * index], self.scores[2 * index + 1], self.passed[index]
+        mg, eg, passed = evaluate_pawns(pos.squares)
+        # Empty slots have key 0, like a pawnless position, and hold that
+        # position's all-zero entry, so a key match is always a valid hit
+        if self.keys[index]:
+            self.replacements += 1
+        self.keys[index] = key
+        self.scores[2 * index] = mg
+        self.scores[2 * index + 1] = eg
+        self.passed[index] = passed
+        return mg, eg, passed
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self.keys),
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate(), 4),
+            "replacements": self.replacements,
+        }
+
+
+def benchmark(depth=4):
+    # Pawn table hit rate over fixed-depth searches, and what a probe saves.
+    # Imported here because position and search import this module
+    from position import Position
+    from search import BENCH_FENS, Search
+
+    table = PawnTable()
+    print(f"{'probes':>10} {'hit rate':>9}   position")
+    for fen in BENCH_FENS:
+        table.reset_stats()
+        Search(depth=depth, pawn_table=table).search(Position(fen))
+        print(f"{table.probes:>10,} {table.hit_rate():>9.1%}   {fen}")
+    pos = Position(BENCH_FENS[0])
+    count = 20000
+    start = time.perf_counter()
+    for _ in range(count):
+        evaluate_pawns(pos.squares)
+    computed = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for _ in range(count):
+        table.probe(pos)
+    cached = (time.perf_counter() - start) / count
+    print(f"pawn eval {computed * 1e6:.2f}us computed, {cached * 1e6:.2f}us from the table")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pawn hash table statistics")
+    parser.add_argument("--depth", type=int, default=4)
+    args = parser.parse_args(argv)
+    benchmark(args.depth)
+
+
+if __name__ == "__main__":
+    main()
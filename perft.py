@@ -0,0 +1,130 @@
+# Perft: count the leaf nodes of the legal move tree to a fixed depth and
+# compare against published reference counts. Runs without pygame or a
+# display, so it doubles as a move generator regression benchmark.
+#
+#   python perft.py                    # reference suite to depth 3
+#   python perft.py --depth 5 --only kiwipete
+#   python perft.py --fen "<fen>" --depth 3 --divide
+
+import argparse
+import json
+import sys
+import time
+
+from movegen import generate_moves
+from position import START_FEN, Position, move_name
+
+# (name, fen, {depth: nodes})
+REFERENCE_POSITIONS = [
+    ("initial", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609, 6: 119060324}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603, 5: 193690690}),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624, 6: 11030083}),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333, 5: 15833292}),
+    ("position4-mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333, 5: 15833292}),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487, 5: 89941194}),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594, 5: 164075551}),
+]
+
+
+def perft(pos, depth, buffers=None):
+    if buffers is None:
+        buffers = [[] for _ in range(depth + 1)]
+    if depth == 0:
+        return 1
+    moves = generate_moves(pos, buffers[depth])
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        pos.make(move)
+        nodes += perft(pos, depth - 1, buffers)
+        pos.unmake()
+    return nodes
+
+
+def divide(pos, depth):
+    # Node count below each root move, for diffing against another engine
+    results = []
+    for move in generate_moves(pos):
+        pos.make(move)
+        results.append((move_name(move), perft(pos, depth - 1)))
+        pos.unmake()
+    return sorted(results)
+
+
+def timed_perft(pos, depth):
+    start = time.perf_counter()
+    nodes = perft(pos, depth)
+    elapsed = time.perf_counter() - start
+    return nodes, elapsed
+
+
+def run_suite(depth, only=None, as_json=False):
+    ok = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        if only and name not in only:
+            continue
+        d = min(depth, max(expected))
+        nodes, elapsed = timed_perft(Position(fen), d)
+        passed = nodes == expected[d]
+        ok = ok and passed
+        total_nodes += nodes
+        total_time += elapsed
+        nps = nodes / elapsed if elapsed else 0.0
+        if as_json:
+            print(json.dumps({"position": name, "depth": d, "nodes": nodes, "expected": expected[d],
+                              "passed": passed, "seconds": round(elapsed, 4), "nps": round(nps)}))
+        else:
+            status = "ok" if passed else f"FAIL (expected {expected[d]})"
+            print(f"{name:<20} depth {d}  {nodes:>12,} nodes  {elapsed:8.2f}s  {nps:>12,.0f} nps  {status}")
+    nps = total_nodes / total_time if total_time else 0.0
+    if as_json:
+        print(json.dumps({"total_nodes": total_nodes, "seconds": round(total_time, 4),
+                          "nps": round(nps), "passed": ok}))
+    else:
+        print(f"{'total':<20}          {total_nodes:>12,} nodes  {total_time:8.2f}s  {nps:>12,.0f} nps")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move generator perft counts and throughput")
+    parser.add_argument("--depth", type=int, default=3, help="search depth (capped per reference position)")
+    parser.add_argument("--fen", help="run a single position instead of the reference suite")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="reference positions to run")
+    parser.add_argument("--divide", action="store_true", help="print node counts per root move")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per line")
+    args = parser.parse_args(argv)
+
+    if args.fen or args.divide:
+        fen = args.fen or START_FEN
+        if not args.fen and args.only:
+            fen = {name: f for name, f, _ in REFERENCE_POSITIONS}[args.only[0]]
+        pos = Position(fen)
+        if args.divide:
+            start = time.perf_counter()
+            results = divide(pos, args.depth)
+            elapsed = time.perf_counter() - start
+            for name, nodes in results:
+                print(f"{name}: {nodes}")
+            nodes = sum(nodes for _, nodes in results)
+            print(f"\nMoves: {len(results)}\nNodes: {nodes}")
+        else:
+            nodes, elapsed = timed_perft(pos, args.depth)
+            print(f"Nodes: {nodes}")
+        print(f"Time: {elapsed:.2f}s ({nodes / elapsed if elapsed else 0:,.0f} nps)")
+        return 0
+
+    return 0 if run_suite(args.depth, args.only, args.json) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# Standard algebraic notation and PGN export.
+
+from movegen import generate_moves, in_check
+from position import FLAG_CASTLE, FLAG_EN_PASSANT, FLAG_PROMOTION, PAWN, square_name
+
+SAN_LETTERS = " PNBRQK"
+
+
+def move_san(pos, move, legal=None):
+    # SAN for a legal move in pos, e.g. "Nbd7", "exd5", "e8=Q+", "O-O#"
+    frm, to, flag = move & 63, (move >> 6) & 63, move >> 12
+    if flag == FLAG_CASTLE:
+        san = "O-O" if to & 7 == 6 else "O-O-O"
+    else:
+        kind = pos.squares[frm] & 7
+        capture = bool(pos.squares[to]) or flag == FLAG_EN_PASSANT
+        if kind == PAWN:
+            san = square_name(frm)[0] + "x" if capture else ""
+        else:
+            san = SAN_LETTERS[kind]
+            if legal is None:
+                legal = generate_moves(pos)
+            # Other pieces of the same kind that could also move there
+            rivals = [m & 63 for m in legal
+                      if (m >> 6) & 63 == to and m & 63 != frm and pos.squares[m & 63] & 7 == kind]
+            if rivals:
+                if all(sq & 7 != frm & 7 for sq in rivals):
+                    san += square_name(frm)[0]
+                elif all(sq >> 3 != frm >> 3 for sq in rivals):
+                    san += square_name(frm)[1]
+                else:
+                    san += square_name(frm)
+            if capture:
+                san += "x"
+        san += square_name(to)
+        if flag >= FLAG_PROMOTION:
+            san += "=" + "NBRQ"[flag - FLAG_PROMOTION]
+    pos.make(move)
+    try:
+        if in_check(pos):
+            san += "#" if not generate_moves(pos) else "+"
+    finally:
+        pos.unmake()
+    return san
+
+
+def format_game(headers, pos, moves, result, comment=None):
+    # PGN text for moves played from pos; pos is left unchanged
+    lines = [f'[{key} "{value}"]' for key, value in headers.items()]
+    tokens = []
+    played = 0
+    try:
+        for move in moves:
+            if pos.side == 0:
+                tokens.append(f"{pos.fullmove}.")
+            elif not played:
+                tokens.append(f"{pos.fullmove}...")
+            tokens.append(move_san(pos, move))
+            pos.make(move)
+            played += 1
+    finally:
+        for _ in range(played):
+            pos.unmake()
+    if comment:
+        tokens.append("{" + comment + "}")
+    tokens.append(result)
+    # Movetext wrapped at 80 columns, as export format asks
+    text = []
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            text.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    text.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(text) + "\n"
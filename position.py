@@ -0,0 +1,370 @@
+# Compact board representation shared by the engine and the pygame front end.
+# Squares are numbered 0..63 row by row from the top of the screen, so
+# square 0 is a8 and square 63 is h1, matching the old board[row][col] layout.
+
+import evaluation
+from evaluation import EG_TABLES, MG_TABLES, PHASE
+from zobrist import CASTLE_KEYS, EP_KEYS, PIECE_KEYS, SIDE_KEY
+
+WHITE, BLACK = 0, 1
+COLOR_NAMES = ("White", "Black")
+
+EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(7)
+TYPE_NAMES = ("", "Pawn", "Knight", "Bishop", "Rook", "Queen", "King")
+
+NO_SQUARE = -1
+
+# Castling rights bits
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def make_piece(color, piece_type):
+    return piece_type | (color << 3)
+
+
+def piece_type(piece):
+    return piece & 7
+
+
+def piece_color(piece):
+    return piece >> 3
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def square_name(sq):
+    return "abcdefgh"[sq & 7] + str(8 - (sq >> 3))
+
+
+def parse_square(name):
+    return square(8 - int(name[1]), "abcdefgh".index(name[0]))
+
+
+# Moves are packed into ints: from square, to square and a flag field.
+# Flags 4..7 are promotions; the promoted piece type is flag - 2.
+FLAG_NORMAL, FLAG_EN_PASSANT, FLAG_CASTLE, FLAG_PROMOTION = 0, 1, 2, 4
+
+
+def encode_move(frm, to, flag=0):
+    return frm | (to << 6) | (flag << 12)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_flag(move):
+    return move >> 12
+
+
+def move_name(move):
+    # Long algebraic notation as used by UCI, e.g. "e2e4" or "e7e8q"
+    name = square_name(move & 63) + square_name((move >> 6) & 63)
+    if move >> 12 >= FLAG_PROMOTION:
+        name += "nbrq"[(move >> 12) - FLAG_PROMOTION]
+    return name
+
+
+# Piece code <-> image name used by the renderer ("KnightBlack", ...)
+PIECE_NAMES = {}
+NAME_TO_PIECE = {}
+for _color in (WHITE, BLACK):
+    for _type in range(PAWN, KING + 1):
+        _name = TYPE_NAMES[_type] + COLOR_NAMES[_color]
+        PIECE_NAMES[make_piece(_color, _type)] = _name
+        NAME_TO_PIECE[_name] = make_piece(_color, _type)
+
+FEN_CHARS = {}
+for _color in (WHITE, BLACK):
+    for _type, _char in zip(range(PAWN, KING + 1), "pnbrqk"):
+        FEN_CHARS[make_piece(_color, _type)] = _char.upper() if _color == WHITE else _char
+FEN_PIECES = {char: piece for piece, char in FEN_CHARS.items()}
+
+# Castling rights that survive a move touching the given square
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[square(7, 4)] = 15 & ~(CASTLE_WK | CASTLE_WQ)
+CASTLE_MASK[square(7, 7)] = 15 & ~CASTLE_WK
+CASTLE_MASK[square(7, 0)] = 15 & ~CASTLE_WQ
+CASTLE_MASK[square(0, 4)] = 15 & ~(CASTLE_BK | CASTLE_BQ)
+CASTLE_MASK[square(0, 7)] = 15 & ~CASTLE_BK
+CASTLE_MASK[square(0, 0)] = 15 & ~CASTLE_BQ
+
+# King destination -> (rook from, rook to) for castling moves
+CASTLE_ROOK_MOVES = {
+    square(7, 6): (square(7, 7), square(7, 5)),
+    square(7, 2): (square(7, 0), square(7, 3)),
+    square(0, 6): (square(0, 7), square(0, 5)),
+    square(0, 2): (square(0, 0), square(0, 3)),
+}
+
+
+class Position:
+    # mg, eg and phase are the running evaluation sums (see evaluation.py);
+    # pawn_hash keys the pawn hash table (see pawns.py)
+    __slots__ = ("squares", "side", "castling", "ep", "kings", "halfmove", "fullmove", "hash",
+                 "pieces", "piece_index", "history", "mg", "eg", "phase", "pawn_hash")
+
+    def __init__(self, fen=START_FEN):
+        self.set_fen(fen)
+
+    def set_fen(self, fen):
+        fields = fen.split()
+        squares = bytearray(64)
+        kings = [NO_SQUARE, NO_SQUARE]
+        sq = 0
+        for char in fields[0]:
+            if char == "/":
+                continue
+            if char.isdigit():
+                sq += int(char)
+                continue
+            piece = FEN_PIECES[char]
+            squares[sq] = piece
+            if piece_type(piece) == KING:
+                kings[piece_color(piece)] = sq
+            sq += 1
+        if sq != 64:
+            raise ValueError(f"Invalid FEN board: {fields[0]}")
+        self.squares = squares
+        self.kings = kings
+        self.pieces = [[], []]
+        self.piece_index = bytearray(64)
+        for sq, piece in enumerate(squares):
+            if piece:
+                self._add_piece(piece_color(piece), sq)
+        self.history = []
+        self.side = WHITE if len(fields) < 2 or fields[1] == "w" else BLACK
+        self.castling = 0
+        if len(fields) > 2:
+            for char, bit in zip("KQkq", (CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ)):
+                if char in fields[2]:
+                    self.castling |= bit
+        self.ep = parse_square(fields[3]) if len(fields) > 3 and fields[3] != "-" else NO_SQUARE
+        self.halfmove = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove = int(fields[5]) if len(fields) > 5 else 1
+        self.hash = self.compute_hash()
+        self.pawn_hash = self.compute_pawn_hash()
+        self.mg, self.eg, self.phase = evaluation.compute(squares)
+
+    def compute_hash(self):
+        key = CASTLE_KEYS[self.castling]
+        for sq, piece in enumerate(self.squares):
+            if piece:
+                key ^= PIECE_KEYS[piece][sq]
+        if self.ep != NO_SQUARE:
+            key ^= EP_KEYS[self.ep & 7]
+        if self.side == BLACK:
+            key ^= SIDE_KEY
+        return key
+
+    def compute_pawn_hash(self):
+        # Zobrist key over the pawns alone
+        key = 0
+        for sq, piece in enumerate(self.squares):
+            if piece_type(piece) == PAWN:
+                key ^= PIECE_KEYS[piece][sq]
+        return key
+
+    def fen(self):
+        rows = []
+        for row in range(8):
+            text = ""
+            empty = 0
+            for col in range(8):
+                piece = self.squares[square(row, col)]
+                if piece:
+                    if empty:
+                        text += str(empty)
+                        empty = 0
+                    text += FEN_CHARS[piece]
+                else:
+                    empty += 1
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        castling = "".join(char for char, bit in zip("KQkq", (CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ))
+                           if self.castling & bit) or "-"
+        ep = square_name(self.ep) if self.ep != NO_SQUARE else "-"
+        return f"{'/'.join(rows)} {'wb'[self.side]} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    def copy(self):
+        other = Position.__new__(Position)
+        other.squares = bytearray(self.squares)
+        other.kings = self.kings[:]
+        other.pieces = [self.pieces[WHITE][:], self.pieces[BLACK][:]]
+        other.piece_index = bytearray(self.piece_index)
+        other.history = self.history[:]
+        other.side = self.side
+        other.castling = self.castling
+        other.ep = self.ep
+        other.halfmove = self.halfmove
+        other.fullmove = self.fullmove
+        other.hash = self.hash
+        other.mg = self.mg
+        other.eg = self.eg
+        other.phase = self.phase
+        other.pawn_hash = self.pawn_hash
+        return other
+
+    # Adapter for the renderer, which thinks in rows/columns and piece image
+    # names.
+    def name_at(self, row, col):
+        piece = self.squares[square(row, col)]
+        return PIECE_NAMES[piece] if piece else None
+
+    # Piece list bookkeeping. pieces[color] holds the occupied squares of that
+    # color and piece_index maps a square to its slot, so updates are O(1).
+    def _add_piece(self, color, sq):
+        pieces = self.pieces[color]
+        self.piece_index[sq] = len(pieces)
+        pieces.append(sq)
+
+    def _remove_piece(self, color, sq):
+        pieces = self.pieces[color]
+        last = pieces.pop()
+        if last != sq:
+            slot = self.piece_index[sq]
+            pieces[slot] = last
+            self.piece_index[last] = slot
+
+    def _move_piece(self, color, frm, to):
+        slot = self.piece_index[frm]
+        self.pieces[color][slot] = to
+        self.piece_index[to] = slot
+
+    def make(self, move):
+        squares = self.squares
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 12
+        piece = squares[frm]
+        side = self.side
+        captured_sq = to
+        if flag == FLAG_EN_PASSANT:
+            captured_sq = to + 8 if side == WHITE else to - 8
+        captured = squares[captured_sq]
+        self.history.append((move, captured, self.castling, self.ep, self.halfmove, self.hash,
+                             self.mg, self.eg, self.phase, self.pawn_hash))
+        key = self.hash ^ PIECE_KEYS[piece][frm] ^ SIDE_KEY
+        mg = self.mg - MG_TABLES[piece][frm]
+        eg = self.eg - EG_TABLES[piece][frm]
+        if captured:
+            key ^= PIECE_KEYS[captured][captured_sq]
+            mg -= MG_TABLES[captured][captured_sq]
+            eg -= EG_TABLES[captured][captured_sq]
+            self.phase -= PHASE[captured]
+            if piece_type(captured) == PAWN:
+                self.pawn_hash ^= PIECE_KEYS[captured][captured_sq]
+            squares[captured_sq] = EMPTY
+            self._remove_piece(side ^ 1, captured_sq)
+        if self.ep != NO_SQUARE:
+            key ^= EP_KEYS[self.ep & 7]
+        squares[frm] = EMPTY
+        if piece_type(piece) == PAWN:
+            self.pawn_hash ^= PIECE_KEYS[piece][frm]
+        if flag >= FLAG_PROMOTION:
+            piece = make_piece(side, flag - 2)
+            self.phase += PHASE[piece]
+        squares[to] = piece
+        key ^= PIECE_KEYS[piece][to]
+        mg += MG_TABLES[piece][to]
+        eg += EG_TABLES[piece][to]
+        self._move_piece(side, frm, to)
+        if piece_type(piece) == KING:
+            self.kings[side] = to
+            if flag == FLAG_CASTLE:
+                rook_from, rook_to = CASTLE_ROOK_MOVES[to]
+                rook = squares[rook_from]
+                squares[rook_to] = rook
+                squares[rook_from] = EMPTY
+                self._move_piece(side, rook_from, rook_to)
+                key ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+                mg += MG_TABLES[rook][rook_to] - MG_TABLES[rook][rook_from]
+                eg += EG_TABLES[rook][rook_to] - EG_TABLES[rook][rook_from]
+        castling = self.castling & CASTLE_MASK[frm] & CASTLE_MASK[to]
+        if castling != self.castling:
+            key ^= CASTLE_KEYS[self.castling] ^ CASTLE_KEYS[castling]
+            self.castling = castling
+        self.ep = NO_SQUARE
+        if piece_type(piece) == PAWN:
+            self.pawn_hash ^= PIECE_KEYS[piece][to]
+            self.halfmove = 0
+            if abs(to - frm) == 16:
+                self.ep = (frm + to) // 2
+                key ^= EP_KEYS[self.ep & 7]
+        elif captured:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+        self.hash = key
+        self.mg = mg
+        self.eg = eg
+        if side == BLACK:
+            self.fullmove += 1
+        self.side = side ^ 1
+
+    def unmake(self):
+        (move, captured, self.castling, self.ep, self.halfmove, self.hash,
+         self.mg, self.eg, self.phase, self.pawn_hash) = self.history.pop()
+        squares = self.squares
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 12
+        side = self.side ^ 1
+        self.side = side
+        piece = squares[to]
+        if flag >= FLAG_PROMOTION:
+            piece = make_piece(side, PAWN)
+        squares[frm] = piece
+        squares[to] = EMPTY
+        self._move_piece(side, to, frm)
+        if piece_type(piece) == KING:
+            self.kings[side] = frm
+            if flag == FLAG_CASTLE:
+                rook_from, rook_to = CASTLE_ROOK_MOVES[to]
+                squares[rook_from] = squares[rook_to]
+                squares[rook_to] = EMPTY
+                self._move_piece(side, rook_to, rook_from)
+        if captured:
+            captured_sq = to
+            if flag == FLAG_EN_PASSANT:
+                captured_sq = to + 8 if side == WHITE else to - 8
+            squares[captured_sq] = captured
+            self._add_piece(side ^ 1, captured_sq)
+        if side == BLACK:
+            self.fullmove -= 1
+
+    # Draw rules. The history keeps the hash from before every move, so
+    # earlier occurrences are found without replaying the game.
+    def repetitions(self):
+        # Earlier occurrences of the current position since the last capture
+        # or pawn move; 2 means a threefold repetition
+        count = 0
+        history = self.history
+        for back in range(2, min(self.halfmove, len(history)) + 1, 2):
+            if history[-back][5] == self.hash:
+                count += 1
+        return count
+
+    def insufficient_material(self):
+        # Bare kings, a single minor piece, or bishops all on one square colour
+        minors = []
+        for color in (WHITE, BLACK):
+            for sq in self.pieces[color]:
+                kind = piece_type(self.squares[sq])
+                if kind in (PAWN, ROOK, QUEEN):
+                    return False
+                if kind != KING:
+                    minors.append((kind, sq))
+        if len(minors) <= 1:
+            return True
+        return (all(kind == BISHOP for kind, _ in minors)
+                and len({((sq >> 3) + sq) & 1 for _, sq in minors}) == 1)
@@ -0,0 +1,526 @@
+# Negamax alpha-beta search with iterative deepening.
+# Every search runs under a depth, node and time budget; when the budget runs
+# out the best move found so far is returned.
+#
+# Leaves are resolved by a capture-only quiescence search. Moves are tried
+# in the order TT move, winning captures by MVV-LVA, killer moves, quiet
+# moves by history score, then captures that lose material by static
+# exchange evaluation (which quiescence skips outright).
+#
+#   python search.py               # node counts with and without move ordering
+#   python search.py --depth 4 --node-limit 2000000
+#   python search.py --profile search.prof
+
+import argparse
+import random
+import time
+
+from evaluation import evaluate
+from movegen import (
+    KING_TARGETS, KNIGHT_TARGETS, PAWN_CAPTURES, SLIDER_RAYS, generate_moves, in_check,
+)
+from position import (
+    BISHOP, FLAG_EN_PASSANT, FLAG_PROMOTION, KING, KNIGHT, NO_SQUARE, PAWN, QUEEN, ROOK, Position,
+    move_name,
+)
+from pawns import PawnTable
+from stats import profile
+from tt import EXACT, LOWER, UPPER, TranspositionTable
+
+MATE_SCORE = 30000
+MAX_PLY = 64
+INFINITY = MATE_SCORE + 1
+# Tablebase results sit below every mate the search itself can find, and
+# outside the range the transposition table adjusts by ply
+TB_WIN_SCORE = MATE_SCORE - 2 * MAX_PLY
+
+PIECE_VALUES = (0, 100, 320, 330, 500, 900, 0)
+SEE_VALUES = PIECE_VALUES[:KING] + (20000,)  # a king can only end an exchange
+
+# Move ordering bands; scores within a band come from MVV-LVA or history
+TT_MOVE_SCORE = 1 << 30
+GOOD_CAPTURE_SCORE = 1 << 26
+KILLER_SCORE = 1 << 25
+BAD_CAPTURE_SCORE = -(1 << 26)
+HISTORY_LIMIT = 1 << 24
+
+# Search budget for each choice on the difficulty screen
+DIFFICULTY_LIMITS = {
+    "Easy": {"depth": 2, "nodes": 5000, "time_ms": 300},
+    "Med": {"depth": 4, "nodes": 100000, "time_ms": 1500},
+    "Hard": {"depth": MAX_PLY, "nodes": None, "time_ms": 4000},
+}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Search:
+    def __init__(self, depth=MAX_PLY, nodes=None, time_ms=None, tt=None,
+                 stop_event=None, on_iteration=None, helper=0, tablebases=None, ordering=True,
+                 pawn_table=None):
+        self.max_depth = min(depth, MAX_PLY)
+        # ordering=False searches moves in generation order, for comparison
+        self.ordering = ordering
+        # stop_event: any object with is_set(), e.g. a multiprocessing.Event
+        self.stop_event = stop_event
+        # on_iteration(search) is called after every completed depth
+        self.on_iteration = on_iteration
+        # Lazy SMP helpers (helper > 0) vary depth and root order to spread work
+        self.helper = helper
+        self.tt = tt if tt is not None else TranspositionTable()
+        # Pass a pawns.PawnTable to keep pawn structure scores between searches
+        self.pawn_table = pawn_table if pawn_table is not None else PawnTable()
+        # tablebase.Tablebases for exact results in small endings
+        self.tablebases = tablebases if tablebases is not None and tablebases.tables else None
+        self.max_nodes = nodes
+        self.time_ms = time_ms
+        self.nodes = 0
+        self.qnodes = 0  # the part of nodes spent in quiescence search
+        self.deadline = None
+        self.best_move = None
+        self.best_score = 0
+        self.depth_reached = 0
+        self.pv = []
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        self.move_buffers = [[] for _ in range(MAX_PLY + 1)]
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * (2 * 4096)  # [side][from | to << 6]
+        self.current_depth = 0
+        self.stopped = False
+        # Counters for stats(); iterations has one entry per completed depth
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.iterations = []
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def stop(self):
+        # Safe to call from another thread; the search unwinds within ~250 nodes
+        self.stopped = True
+
+    def check_budget(self):
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        if self.nodes & 255 == 0 and (
+                self.stopped
+                or (self.deadline is not None and time.perf_counter() >= self.deadline)
+                or (self.stop_event is not None and self.stop_event.is_set())):
+            raise SearchTimeout()
+
+    def search(self, pos):
+        self.nodes = 0
+        self.qnodes = 0
+        self.tt_probes = self.tt_hits = 0
+        self.cutoffs = self.first_move_cutoffs = 0
+        self.iterations = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        self.history = [0] * (2 * 4096)
+        self.best_move = None
+        self.best_score = 0
+        self.depth_reached = 0
+        self.pv = []
+        if self.time_ms is not None:
+            self.deadline = time.perf_counter() + self.time_ms / 1000
+        self.tt.new_search()
+        root_moves = generate_moves(pos)
+        if not root_moves:
+            return None
+        if self.tablebases is not None:
+            # Inside the tables the best move is known outright
+            known = self.tablebases.best_move(pos)
+            if known is not None:
+                move, wdl, plies = known
+                self.best_move = move
+                self.best_score = tablebase_score(wdl, plies)
+                self.pv = [move]
+                self.elapsed = time.perf_counter() - self.started
+                return move
+        first_depth = 1
+        if self.ordering:
+            root_moves.sort(key=self.move_orderer(pos, 0, 0), reverse=True)
+        if self.helper:
+            random.Random(self.helper).shuffle(root_moves)
+            first_depth = min(1 + self.helper % 2, self.max_depth)
+        for depth in range(first_depth, self.max_depth + 1):
+            self.current_depth = depth
+            iteration_start = time.perf_counter()
+            nodes_before, qnodes_before = self.nodes, self.qnodes
+            try:
+                score = self.search_root(pos, root_moves, depth)
+            except SearchTimeout:
+                self.pv = self.pv_table[0][:]
+                break
+            self.best_score = score
+            self.depth_reached = depth
+            self.pv = self.pv_table[0][:]
+            self.iterations.append({
+                "depth": depth, "score": score, "nodes": self.nodes - nodes_before,
+                "qnodes": self.qnodes - qnodes_before,
+                "ms": round((time.perf_counter() - iteration_start) * 1000, 2),
+            })
+            if self.on_iteration is not None:
+                self.on_iteration(self)
+            if abs(score) >= MATE_SCORE - MAX_PLY or self.stopped:
+                break
+        if self.best_move is None:
+            # Not even depth 1 finished inside the budget
+            self.best_move = root_moves[0]
+        self.elapsed = time.perf_counter() - self.started
+        return self.best_move
+
+    def search_root(self, pos, root_moves, depth):
+        # Search the previous best move first so a partial iteration can only
+        # replace it with a move that has been fully searched and is better.
+        if self.best_move is not None:
+            root_moves.remove(self.best_move)
+            root_moves.insert(0, self.best_move)
+        alpha, beta = -INFINITY, INFINITY
+        for move in root_moves:
+            pos.make(move)
+            try:
+                score = -self.negamax(pos, depth - 1, -beta, -alpha, 1)
+            finally:
+                pos.unmake()
+            if score > alpha:
+                alpha = score
+                self.best_move = move
+                self.pv_table[0] = [move] + self.pv_table[1]
+        self.tt.store(pos.hash, self.best_move, alpha, depth, EXACT)
+        return alpha
+
+    def negamax(self, pos, depth, alpha, beta, ply):
+        self.pv_table[ply] = []
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(pos, alpha, beta, ply)
+        self.nodes += 1
+        self.check_budget()
+        if self.tablebases is not None:
+            known = self.tablebases.probe(pos)
+            if known is not None:
+                return tablebase_score(*known)
+        key = pos.hash
+        tt_move = 0
+        entry = self.tt.probe(key)
+        self.tt_probes += 1
+        if entry is not None:
+            self.tt_hits += 1
+            tt_move, tt_score, tt_depth, tt_bound = entry
+            if tt_depth >= depth:
+                tt_score = score_from_tt(tt_score, ply)
+                if (tt_bound == EXACT or (tt_bound == LOWER and tt_score >= beta)
+                        or (tt_bound == UPPER and tt_score <= alpha)):
+                    return tt_score
+        moves = generate_moves(pos, self.move_buffers[ply])
+        if not moves:
+            # Checkmate, scored so that shorter mates are preferred, or stalemate
+            return -MATE_SCORE + ply if in_check(pos) else 0
+        if self.ordering:
+            first = tt_move or (self.pv[ply] if ply < len(self.pv) else 0)
+            moves.sort(key=self.move_orderer(pos, ply, first), reverse=True)
+        alpha_orig = alpha
+        best = -INFINITY
+        best_move = 0
+        for move in moves:
+            pos.make(move)
+            try:
+                score = -self.negamax(pos, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                pos.unmake()
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if move == moves[0]:
+                            self.first_move_cutoffs += 1
+                        if not is_capture(pos, move):
+                            self.update_quiet(pos.side, move, depth, ply)
+                        break
+        if best <= alpha_orig:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, best_move if bound != UPPER else 0, score_to_tt(best, ply), depth, bound)
+        return best
+
+    def quiescence(self, pos, alpha, beta, ply):
+        # Captures only, so the static eval is never taken in the middle of
+        # an exchange. In check every evasion is tried instead.
+        self.nodes += 1
+        self.qnodes += 1
+        self.check_budget()
+        if ply >= MAX_PLY:
+            return evaluate(pos, self.pawn_table)
+        checked = in_check(pos)
+        best = -INFINITY
+        if not checked:
+            best = evaluate(pos, self.pawn_table)
+            if best >= beta:
+                return best
+            if best > alpha:
+                alpha = best
+        moves = generate_moves(pos, self.move_buffers[ply])
+        if not moves:
+            return -MATE_SCORE + ply if checked else 0
+        if not checked:
+            # Exchanges that lose material cannot raise the score
+            moves[:] = [move for move in moves
+                        if (is_capture(pos, move) or move >> 12 >= FLAG_PROMOTION)
+                        and not losing_capture(pos, move)]
+        # Always ordered: without MVV-LVA the capture tree grows exponentially
+        moves.sort(key=self.move_orderer(pos, ply, 0), reverse=True)
+        for move in moves:
+            pos.make(move)
+            try:
+                score = -self.quiescence(pos, -beta, -alpha, ply + 1)
+            finally:
+                pos.unmake()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def move_orderer(self, pos, ply, first):
+        # Sort key for the moves at this node, highest first
+        squares = pos.squares
+        killers = self.killers[ply]
+        history = self.history
+        side_offset = pos.side << 12
+
+        def score(move):
+            if move == first:
+                return TT_MOVE_SCORE
+            flag = move >> 12
+            victim = PAWN if flag == FLAG_EN_PASSANT else squares[(move >> 6) & 63] & 7
+            if victim or flag >= FLAG_PROMOTION:
+                # Most valuable victim first, then least valuable attacker
+                value = PIECE_VALUES[victim] * 16 - (squares[move & 63] & 7)
+                if flag >= FLAG_PROMOTION:
+                    value += PIECE_VALUES[flag - 2] * 16
+                if losing_capture(pos, move):
+                    return BAD_CAPTURE_SCORE + value
+                return GOOD_CAPTURE_SCORE + value
+            if move == killers[0]:
+                return KILLER_SCORE + 1
+            if move == killers[1]:
+                return KILLER_SCORE
+            return history[side_offset | (move & 0xFFF)]
+
+        return score
+
+    def update_quiet(self, side, move, depth, ply):
+        # A quiet move caused a cutoff: remember it as a killer for this ply
+        # and credit it in the history table
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        index = side << 12 | (move & 0xFFF)
+        self.history[index] += depth * depth
+        if self.history[index] >= HISTORY_LIMIT:
+            self.history = [value // 2 for value in self.history]
+
+    def stats(self):
+        # Counters for the last search, JSON-ready
+        seconds = self.elapsed
+        iterations = self.iterations
+        branching = None
+        if len(iterations) >= 2 and iterations[-2]["nodes"]:
+            # Effective branching factor: growth of the last completed depth
+            branching = round(iterations[-1]["nodes"] / iterations[-2]["nodes"], 2)
+        return {
+            "depth": self.depth_reached,
+            "score": self.best_score,
+            "pv": [move_name(move) for move in self.pv],
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "ms": round(seconds * 1000, 2),
+            "nps": round(self.nodes / seconds) if seconds else 0,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": round(self.tt_hits / self.tt_probes, 4) if self.tt_probes else 0.0,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": round(self.first_move_cutoffs / self.cutoffs, 4) if self.cutoffs else 0.0,
+            "branching_factor": branching,
+            "pawn_hit_rate": round(self.pawn_table.hit_rate(), 4),
+            "iterations": iterations,
+        }
+
+
+def is_capture(pos, move):
+    return bool(pos.squares[(move >> 6) & 63]) or move >> 12 == FLAG_EN_PASSANT
+
+
+def losing_capture(pos, move):
+    # Only a capture (or promotion) by a piece worth more than what it takes
+    # can lose material, so SEE is skipped for the rest
+    squares = pos.squares
+    victim = PAWN if move >> 12 == FLAG_EN_PASSANT else squares[(move >> 6) & 63] & 7
+    return PIECE_VALUES[squares[move & 63] & 7] > PIECE_VALUES[victim] and see(pos, move) < 0
+
+
+def least_valuable_attacker(squares, sq, side):
+    # Square of the cheapest piece of `side` attacking sq, or NO_SQUARE
+    bits = side << 3
+    pawn = PAWN | bits
+    for s in PAWN_CAPTURES[side ^ 1][sq]:
+        if squares[s] == pawn:
+            return s
+    knight = KNIGHT | bits
+    for s in KNIGHT_TARGETS[sq]:
+        if squares[s] == knight:
+            return s
+    queen = QUEEN | bits
+    queen_sq = NO_SQUARE
+    for kind in (BISHOP, ROOK):
+        slider = kind | bits
+        for ray in SLIDER_RAYS[kind][sq]:
+            for s in ray:
+                piece = squares[s]
+                if piece:
+                    if piece == slider:
+                        return s
+                    if piece == queen:
+                        queen_sq = s
+                    break
+    if queen_sq != NO_SQUARE:
+        return queen_sq
+    king = KING | bits
+    for s in KING_TARGETS[sq]:
+        if squares[s] == king:
+            return s
+    return NO_SQUARE
+
+
+def see(pos, move):
+    # Static exchange evaluation: material the mover ends up with after both
+    # sides keep recapturing on the target square with their cheapest
+    # attacker, each free to stop when going on would lose. Pieces that
+    # move off a line uncover the sliders behind them; pins are ignored.
+    squares = bytearray(pos.squares)
+    frm, to, flag = move & 63, (move >> 6) & 63, move >> 12
+    piece = squares[frm]
+    if flag == FLAG_EN_PASSANT:
+        squares[to + (8 if pos.side == 0 else -8)] = 0
+        gains = [SEE_VALUES[PAWN]]
+    else:
+        gains = [SEE_VALUES[squares[to] & 7]]
+    on_square = SEE_VALUES[piece & 7]
+    if flag >= FLAG_PROMOTION:
+        gains[0] += SEE_VALUES[flag - 2] - SEE_VALUES[PAWN]
+        on_square = SEE_VALUES[flag - 2]
+    squares[frm] = 0
+    squares[to] = piece
+    side = pos.side ^ 1
+    while True:
+        sq = least_valuable_attacker(squares, to, side)
+        if sq == NO_SQUARE:
+            break
+        gains.append(on_square - gains[-1])
+        on_square = SEE_VALUES[squares[sq] & 7]
+        squares[to] = squares[sq]
+        squares[sq] = 0
+        side ^= 1
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
+
+
+# Mate scores are stored relative to the node so they stay valid when the
+# same position is reached at a different ply.
+def score_to_tt(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+def tablebase_score(wdl, plies):
+    if wdl > 0:
+        return TB_WIN_SCORE - plies
+    if wdl < 0:
+        return -TB_WIN_SCORE + plies
+    return 0
+
+
+# Without ordering kiwipete needs about a million nodes for depth 3 and far
+# more for depth 4, so the comparison caps the unordered search
+UNORDERED_NODE_LIMIT = 250000
+
+BENCH_FENS = [
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "2r3k1/pp3ppp/2n1b3/3p4/3P4/2N1BN2/PP3PPP/2R3K1 w - - 0 1",
+]
+
+
+def compare_ordering(depth, fens=BENCH_FENS, node_limit=UNORDERED_NODE_LIMIT):
+    # Nodes to reach the same depth with and without move ordering. The
+    # unordered tree grows so fast that its search stops at node_limit; a
+    # "+" marks those counts, and the reduction is then a lower bound
+    rows = []
+    for fen in fens:
+        row = [fen]
+        for ordering in (False, True):
+            search = Search(depth=depth, ordering=ordering, nodes=None if ordering else node_limit)
+            start = time.perf_counter()
+            search.search(Position(fen))
+            capped = search.max_nodes is not None and search.nodes >= search.max_nodes
+            row.append((search.nodes, search.qnodes, time.perf_counter() - start, capped))
+        rows.append(row)
+    print(f"{'unordered':>22} {'ordered':>22}  {'reduction':>9}")
+    totals = [0, 0]
+    any_capped = False
+    for fen, unordered, ordered in rows:
+        totals[0] += unordered[0]
+        totals[1] += ordered[0]
+        any_capped = any_capped or unordered[3]
+        mark = "+" if unordered[3] else " "
+        print(f"{unordered[0]:>11,}{mark} {unordered[2]:>8.2f}s {ordered[0]:>12,} {ordered[2]:>8.2f}s"
+              f"  {1 - ordered[0] / unordered[0]:>8.1%}   {fen}")
+    mark = "+" if any_capped else " "
+    print(f"{totals[0]:>11,}{mark} {'':>9} {totals[1]:>12,} {'':>9}  {1 - totals[1] / totals[0]:>8.1%}   total")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search node counts with and without move ordering")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fen", action="append", help="position to search (default: bench positions)")
+    parser.add_argument("--node-limit", type=int, default=UNORDERED_NODE_LIMIT,
+                        help="stop the unordered search after this many nodes (0: no limit)")
+    parser.add_argument("--profile", metavar="PATH", help="run under cProfile and write the stats to PATH")
+    args = parser.parse_args(argv)
+    node_limit = args.node_limit or None
+    if args.profile:
+        profile(compare_ordering, args.profile, args.depth, args.fen or BENCH_FENS, node_limit)
+    else:
+        compare_ordering(args.depth, args.fen or BENCH_FENS, node_limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Instrumentation shared by the game and the command line tools: frame
+# timing for the pygame loop, a JSON-lines log for per-move search counters
+# (see Search.stats()), and a cProfile wrapper.
+#
+# The profiler also covers threads started while it runs, so a game profile
+# includes the AI search on its background thread. From Python 3.12 cProfile
+# is built on sys.monitoring and one profiler already sees every thread;
+# before that each new thread gets a profiler of its own.
+#
+#   python -m pstats chess.prof       # browse a profile written by --profile
+
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+
+
+class FrameTimer:
+    # Time spent working per frame, excluding the wait for the next tick
+    def __init__(self, window=120):
+        self.times = deque(maxlen=window)
+        self.frames = 0
+        self.started = None
+
+    def begin(self):
+        self.started = time.perf_counter()
+
+    def end(self):
+        if self.started is not None:
+            self.times.append(time.perf_counter() - self.started)
+            self.frames += 1
+            self.started = None
+
+    def stats(self):
+        times = self.times
+        return {
+            "frames": self.frames,
+            "frame_ms_avg": round(sum(times) / len(times) * 1000, 2) if times else 0.0,
+            "frame_ms_max": round(max(times) * 1000, 2) if times else 0.0,
+        }
+
+
+class JsonLinesLog:
+    # Appends one JSON object per line, flushed so a crash loses nothing
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a")
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def profile(func, path, *args, top=25):
+    # Runs func(*args) under cProfile, writes the stats to path and prints
+    # the most expensive calls. Threads started meanwhile are profiled too
+    profiles = [cProfile.Profile()]
+
+    def start_thread_profile(frame, event, arg):
+        # threading.setprofile runs this once in each new thread; it hands
+        # over to a profiler of that thread's own
+        sys.setprofile(None)
+        thread_profile = cProfile.Profile()
+        try:
+            thread_profile.enable()
+        except ValueError:
+            return  # another profiler is active; the thread runs unprofiled
+        profiles.append(thread_profile)
+
+    per_thread = sys.version_info < (3, 12)
+    if per_thread:
+        threading.setprofile(start_thread_profile)
+    profiles[0].enable()
+    try:
+        return func(*args)
+    finally:
+        profiles[0].disable()
+        if per_thread:
+            threading.setprofile(None)
+        combined = pstats.Stats(profiles[0])
+        for thread_profile in profiles[1:]:
+            combined.add(thread_profile)
+        combined.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(path, stream=summary).sort_stats("cumulative").print_stats(top)
+        print(summary.getvalue(), file=sys.stderr)
+        print(f"Profile written to {path}", file=sys.stderr)
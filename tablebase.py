@@ -0,0 +1,799 @@
+# Endgame tablebases for three and four piece endings, built by retrograde
+# analysis.
+#
+# Each table covers one material set, named like "KQvKR" with the stronger
+# side stored as White, and holds one byte per position: 0 for a draw, 255 for
+# an illegal or duplicate index, otherwise 1 + the distance to mate in plies.
+# An odd distance means the side to move mates, an even one that it is mated.
+# Positions are indexed directly by king slot, the other piece squares and the
+# side to move, with the board symmetries folded into the king slot, so a
+# probe is a single read from the memory-mapped file.
+#
+# Tables ignore castling rights and store positions without an en passant
+# square; positions where either matters are not probed. Generation still
+# accounts for en passant: a double push that can be taken en passant leads
+# to the position after the push plus that capture, not to the stored entry.
+#
+#   python tablebase.py --build                      # all 3-piece tables
+#   python tablebase.py --build KQvKR KRvKB --workers 4
+#   python tablebase.py --fen "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+#   python tablebase.py --bench --workers 1 2 4
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations_with_replacement
+
+from movegen import (
+    KING_TARGETS, KNIGHT_TARGETS, PAWN_CAPTURES, PAWN_DIRECTION, PAWN_START_ROW, PROMOTION_ROW,
+    SLIDER_RAYS, generate_moves, is_attacked,
+)
+from position import (
+    BISHOP, BLACK, KING, KNIGHT, NO_SQUARE, PAWN, QUEEN, ROOK, WHITE, move_name, Position,
+)
+
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+EXTENSION = ".ctb"
+MAGIC = b"CTB1"
+HEADER = struct.Struct("<4s16sI")  # magic, material name, number of entries
+DRAW, ILLEGAL = 0, 255
+MAX_PIECES = 4  # Kings included; five pieces would need about 1 GB of generation arrays
+
+PIECE_LETTERS = {QUEEN: "Q", ROOK: "R", BISHOP: "B", KNIGHT: "N", PAWN: "P"}
+LETTER_PIECES = {letter: kind for kind, letter in PIECE_LETTERS.items()}
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+
+def _material_sets(pieces):
+    # Every material set with the given number of pieces, kings included
+    names = []
+    letters = "QRBNP"
+    for strong in range(pieces - 2, (pieces - 2) // 2 - 1, -1):
+        weak = pieces - 2 - strong
+        for white in combinations_with_replacement(letters, strong):
+            for black in combinations_with_replacement(letters, weak):
+                name = material_name([LETTER_PIECES[c] for c in white], [LETTER_PIECES[c] for c in black])[0]
+                if name not in names:
+                    names.append(name)
+    return names
+
+
+def _strength(kinds):
+    # More pieces first, then the most valuable piece
+    return len(kinds), sorted((kind if kind != PAWN else 0 for kind in kinds), reverse=True)
+
+
+def material_name(white, black):
+    # ("KQvKR", flipped) for the piece types of each side, kings excluded;
+    # flipped is True when Black holds the stronger side
+    flipped = _strength(black) > _strength(white)
+    if flipped:
+        white, black = black, white
+    order = "QRBNP"
+    name = "K" + "".join(sorted((PIECE_LETTERS[k] for k in white), key=order.index))
+    name += "vK" + "".join(sorted((PIECE_LETTERS[k] for k in black), key=order.index))
+    return name, flipped
+
+
+def parse_material(name):
+    # Piece codes in table order: both kings, then White's and Black's pieces
+    white, black = name.upper().split("V")
+    codes = [KING | WHITE << 3, KING | BLACK << 3]
+    codes += [LETTER_PIECES[c] | WHITE << 3 for c in white[1:]]
+    codes += [LETTER_PIECES[c] | BLACK << 3 for c in black[1:]]
+    return codes
+
+
+THREE_PIECE = _material_sets(3)
+FOUR_PIECE = _material_sets(4)
+
+
+# Board symmetries as square maps. Rows count from rank 8, so rank = 7 - row.
+def _transform(flip_rows, flip_cols, swap):
+    table = []
+    for sq in range(64):
+        row, col = sq >> 3, sq & 7
+        if swap:
+            row, col = 7 - col, 7 - row  # reflect in the a1-h8 diagonal
+        if flip_rows:
+            row = 7 - row
+        if flip_cols:
+            col = 7 - col
+        table.append(row * 8 + col)
+    return tuple(table)
+
+
+ALL_TRANSFORMS = [_transform(r, c, s) for s in (False, True) for r in (False, True) for c in (False, True)]
+MIRROR_TRANSFORMS = [_transform(False, False, False), _transform(False, True, False)]
+
+# White king slots: the a1-d1-d4 triangle without pawns, files a-d with them
+PAWNLESS_SLOTS = [sq for sq in range(64) if (sq & 7) <= 3 and 7 - (sq >> 3) <= (sq & 7)]
+PAWN_SLOTS = [sq for sq in range(64) if (sq & 7) <= 3]
+
+
+def _king_transforms(transforms, slots):
+    return [[t for t in transforms if t[sq] in slots] for sq in range(64)]
+
+
+PAWNLESS_KING_TRANSFORMS = _king_transforms(ALL_TRANSFORMS, set(PAWNLESS_SLOTS))
+PAWN_KING_TRANSFORMS = _king_transforms(MIRROR_TRANSFORMS, set(PAWN_SLOTS))
+
+
+class Table:
+    def __init__(self, name, data=None, offset=HEADER.size):
+        self.name = name
+        self.codes = parse_material(name)
+        self.pawns = any(code & 7 == PAWN for code in self.codes)
+        self.slots = PAWN_SLOTS if self.pawns else PAWNLESS_SLOTS
+        self.king_transforms = PAWN_KING_TRANSFORMS if self.pawns else PAWNLESS_KING_TRANSFORMS
+        self.slot_of = [-1] * 64
+        for i, sq in enumerate(self.slots):
+            self.slot_of[sq] = i
+        # Runs of identical pieces, kept sorted by square so each position
+        # has a single index
+        self.runs = []
+        start = 2
+        for i in range(3, len(self.codes) + 1):
+            if i == len(self.codes) or self.codes[i] != self.codes[start]:
+                if i - start > 1:
+                    self.runs.append((start, i))
+                start = i
+        self.size = len(self.slots) * 64 ** (len(self.codes) - 1) * 2
+        self.data = data
+        self.offset = offset
+
+    def index(self, squares, side):
+        best = None
+        for transform in self.king_transforms[squares[0]]:
+            mapped = [transform[sq] for sq in squares]
+            for a, b in self.runs:
+                mapped[a:b] = sorted(mapped[a:b])
+            if best is None or mapped < best:
+                best = mapped
+        index = self.slot_of[best[0]]
+        for sq in best[1:]:
+            index = index * 64 + sq
+        return index * 2 + side
+
+    def decode(self, index):
+        side = index & 1
+        index >>= 1
+        squares = []
+        for _ in range(len(self.codes) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(self.slots[index])
+        squares.reverse()
+        return squares, side
+
+    def value(self, squares, side):
+        return self.data[self.offset + self.index(squares, side)]
+
+
+def _outcome(value):
+    # Result for the side that moved into a position with this table value:
+    # (1, plies) win, (0, 0) draw, (-1, plies) loss. The stored byte is the
+    # opponent's distance plus one, which is exactly the mover's distance.
+    if value == DRAW:
+        return 0, 0
+    return (1, value) if value & 1 else (-1, value)
+
+
+def _better(a, b):
+    # Whether outcome a is preferable to b for the side choosing between them
+    if a[0] != b[0]:
+        return a[0] > b[0]
+    if a[0] > 0:
+        return a[1] < b[1]  # mate sooner
+    return a[1] > b[1]  # be mated later
+
+
+class Tablebases:
+    def __init__(self, directory=TABLE_DIR):
+        self.directory = directory
+        self.tables = {}
+        self.files = []
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(EXTENSION):
+                    self.load(os.path.join(directory, filename))
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, name, entries = HEADER.unpack_from(data)
+        name = name.rstrip(b"\0").decode()
+        table = Table(name, data)
+        if magic != MAGIC or entries != table.size or len(data) != HEADER.size + entries:
+            data.close()
+            raise ValueError(f"{path} is not a valid {name} table")
+        self.files.append(data)
+        self.add(table)
+
+    def add(self, table):
+        self.tables[table.name] = table
+        self.max_pieces = max(self.max_pieces, len(table.codes))
+
+    def close(self):
+        self.tables = {}
+        self.max_pieces = 0
+        for data in self.files:
+            data.close()
+        self.files = []
+
+    def value(self, codes, squares, side):
+        # Raw table byte for the pieces on the given squares, or None when the
+        # table is not available. Bare kings are always a draw.
+        if len(codes) == 2:
+            return DRAW
+        white = [code & 7 for code in codes if code >> 3 == WHITE and code & 7 != KING]
+        black = [code & 7 for code in codes if code >> 3 == BLACK and code & 7 != KING]
+        name, flipped = material_name(white, black)
+        table = self.tables.get(name)
+        if table is None:
+            return None
+        if flipped:
+            # Swap colours and mirror the ranks so the stronger side is White
+            codes = [code ^ 8 for code in codes]
+            squares = [sq ^ 56 for sq in squares]
+            side ^= 1
+        order = sorted(range(len(codes)), key=lambda i: (_table_order(codes[i]), squares[i]))
+        return table.value([squares[i] for i in order], side)
+
+    def _position_value(self, pos):
+        squares = pos.squares
+        placed = [sq for color in (WHITE, BLACK) for sq in pos.pieces[color]]
+        return self.value([squares[sq] for sq in placed], placed, pos.side)
+
+    def probeable(self, pos):
+        if pos.castling or len(pos.pieces[WHITE]) + len(pos.pieces[BLACK]) > self.max_pieces:
+            return False
+        if pos.ep != NO_SQUARE:
+            pawn = PAWN | pos.side << 3
+            if any(pos.squares[sq] == pawn for sq in PAWN_CAPTURES[pos.side ^ 1][pos.ep]):
+                return False
+        return True
+
+    def probe(self, pos):
+        # (wdl, plies to mate) for the side to move: wdl is 1, 0 or -1.
+        # None when the position is not covered.
+        if not self.probeable(pos):
+            return None
+        value = self._position_value(pos)
+        if value is None or value == ILLEGAL:
+            return None
+        if value == DRAW:
+            return 0, 0
+        plies = value - 1
+        return (1, plies) if plies & 1 else (-1, plies)
+
+    def best_move(self, pos):
+        # (move, wdl, plies) for the move that mates fastest, holds the draw
+        # or resists longest; None when some move leads outside the tables
+        if not self.probeable(pos):
+            return None
+        best = None
+        best_outcome = None
+        for move in generate_moves(pos):
+            pos.make(move)
+            try:
+                value = self._position_value(pos) if self.probeable(pos) else None
+            finally:
+                pos.unmake()
+            if value is None or value == ILLEGAL:
+                return None
+            outcome = _outcome(value)
+            if best is None or _better(outcome, best_outcome):
+                best, best_outcome = move, outcome
+        if best is None:
+            return None
+        return best, best_outcome[0], best_outcome[1]
+
+
+def _table_order(code):
+    # Kings first, then White's pieces and Black's, queens before pawns
+    kind, color = code & 7, code >> 3
+    if kind == KING:
+        return color
+    return 2 + color * 6 + (QUEEN - kind if kind != PAWN else 5)
+
+
+def dependencies(name):
+    # Tables reached by a capture or a promotion, which must be built first
+    codes = parse_material(name)
+    found = []
+    for i in range(2, len(codes)):
+        rest = codes[:i] + codes[i + 1:]
+        children = [rest]
+        if codes[i] & 7 == PAWN:
+            children += [rest + [kind | codes[i] & 8] for kind in PROMOTIONS]
+        for child in children:
+            if len(child) > 2:
+                white = [c & 7 for c in child[2:] if c >> 3 == WHITE]
+                black = [c & 7 for c in child[2:] if c >> 3 == BLACK]
+                child_name = material_name(white, black)[0]
+                if child_name not in found:
+                    found.append(child_name)
+    return found
+
+
+# Generation. The work is split into a forward pass, which classifies every
+# position from its moves, and a backward pass run one distance at a time,
+# which walks unmoves from the newly resolved positions. Both run in chunks
+# on a process pool; the main process owns the arrays.
+
+_gen = {}
+
+
+def _init_generator(name, directory):
+    _gen["table"] = Table(name)
+    _gen["tablebases"] = Tablebases(directory)
+    _gen["board"] = bytearray(64)
+
+
+def _setup(table, board, squares):
+    # Places the pieces; False when the squares overlap or a pawn is on a
+    # back rank
+    ok = True
+    for code, sq in zip(table.codes, squares):
+        if board[sq] or (code & 7 == PAWN and sq >> 3 in (0, 7)):
+            ok = False
+        board[sq] = code
+    return ok
+
+
+def _clear(board, squares):
+    for sq in squares:
+        board[sq] = 0
+
+
+def _targets(board, code, frm):
+    kind = code & 7
+    if kind == KING:
+        return KING_TARGETS[frm]
+    if kind == KNIGHT:
+        return KNIGHT_TARGETS[frm]
+    if kind == PAWN:
+        side = code >> 3
+        direction = PAWN_DIRECTION[side]
+        targets = [to for to in PAWN_CAPTURES[side][frm] if board[to]]
+        to = frm + direction
+        if not board[to]:
+            targets.append(to)
+            if frm >> 3 == PAWN_START_ROW[side] and not board[to + direction]:
+                targets.append(to + direction)
+        return targets
+    targets = []
+    for ray in SLIDER_RAYS[kind][frm]:
+        for to in ray:
+            targets.append(to)
+            if board[to]:
+                break
+    return targets
+
+
+def _en_passant_captures(board, squares, i, code):
+    # Squares of the enemy pawns that may legally take pawn i en passant right
+    # after its double push; board holds the position after the push
+    side = code >> 3
+    to = squares[i]
+    passed = to - PAWN_DIRECTION[side]
+    pawn = PAWN | (side ^ 1) << 3
+    king = squares[side ^ 1]
+    found = []
+    for frm in PAWN_CAPTURES[side][passed]:
+        if board[frm] != pawn:
+            continue
+        board[frm] = board[to] = 0
+        board[passed] = pawn
+        legal = not is_attacked(board, king, side)
+        board[passed] = 0
+        board[frm] = pawn
+        board[to] = code
+        if legal:
+            found.append(frm)
+    return found
+
+
+def _en_passant_value(table, tablebases, squares, i, captures):
+    # Table value reached by the opponent's best en passant capture of pawn i,
+    # for the position after its double push
+    side = table.codes[i] >> 3
+    passed = squares[i] - PAWN_DIRECTION[side]
+    child_codes = table.codes[:i] + table.codes[i + 1:]
+    best = None
+    for frm in captures:
+        child_squares = [passed if sq == frm else sq for sq in squares]
+        del child_squares[i]
+        value = tablebases.value(child_codes, child_squares, side)
+        if value is None:
+            raise RuntimeError(f"{table.name} needs a table for {child_codes}")
+        if best is None or _better(_outcome(value), _outcome(best)):
+            best = value
+    return best
+
+
+def _classify(index, table, tablebases, board):
+    # Forward pass for one position: returns (children, phantom, win, loss,
+    # en_passant) where children are the distinct indices reachable by quiet
+    # moves, phantom counts conversions that stop the position from being
+    # lost, win is the fastest conversion win and loss the slowest conversion
+    # loss (in plies, 0 when there is none). en_passant lists (child, value)
+    # for double pushes the opponent can take en passant: the child index
+    # after the push and the table value of its best en passant capture.
+    # Returns None for illegal or duplicate indices, and (None, in_check)
+    # when there are no moves.
+    squares, side = table.decode(index)
+    codes = table.codes
+    try:
+        if not _setup(table, board, squares) or is_attacked(board, squares[side ^ 1], side):
+            return None
+        if table.index(squares, side) != index:
+            return None
+        children = set()
+        en_passant = []
+        phantom = 0
+        win = 0
+        loss = 0
+        moves = 0
+        king = squares[side]
+        for i, code in enumerate(codes):
+            if code >> 3 != side:
+                continue
+            frm = squares[i]
+            for to in _targets(board, code, frm):
+                target = board[to]
+                if target and target >> 3 == side:
+                    continue
+                board[frm] = 0
+                board[to] = code
+                legal = not is_attacked(board, to if i == side else king, side ^ 1)
+                board[to] = target
+                board[frm] = code
+                if not legal:
+                    continue
+                promotes = code & 7 == PAWN and to >> 3 == PROMOTION_ROW[side]
+                if not target and not promotes:
+                    moves += 1
+                    child = list(squares)
+                    child[i] = to
+                    captures = None
+                    if code & 7 == PAWN and abs(to - frm) == 16:
+                        board[frm] = 0
+                        board[to] = code
+                        captures = _en_passant_captures(board, child, i, code)
+                        board[to] = 0
+                        board[frm] = code
+                    if captures:
+                        value = _en_passant_value(table, tablebases, child, i, captures)
+                        en_passant.append((table.index(child, side ^ 1), value))
+                    else:
+                        children.add(table.index(child, side ^ 1))
+                    continue
+                # Captures and promotions land in another table
+                child_codes = list(codes)
+                child_squares = list(squares)
+                child_squares[i] = to
+                if target:
+                    j = squares.index(to)
+                    del child_codes[j]
+                    del child_squares[j]
+                    i_child = i if i < j else i - 1
+                else:
+                    i_child = i
+                for kind in (PROMOTIONS if promotes else (code & 7,)):
+                    moves += 1
+                    child_codes[i_child] = kind | code & 8
+                    value = tablebases.value(child_codes, child_squares, side ^ 1)
+                    if value is None:
+                        raise RuntimeError(f"{table.name} needs a table for {child_codes}")
+                    result, plies = _outcome(value)
+                    if result >= 0:
+                        phantom += 1
+                    if result > 0 and (not win or plies < win):
+                        win = plies
+                    elif result < 0 and plies > loss:
+                        loss = plies
+        if not moves:
+            return None, is_attacked(board, king, side ^ 1)
+        return children, phantom, win, loss, en_passant
+    finally:
+        _clear(board, squares)
+
+
+def _forward_chunk(start, stop):
+    table, tablebases, board = _gen["table"], _gen["tablebases"], _gen["board"]
+    values = bytearray(stop - start)
+    counts = bytearray(stop - start)
+    conversion_loss = bytearray(stop - start)
+    pending = array("I")  # pairs of (index, plies) to resolve at that distance
+    en_passant = array("I")  # triples of (index, child, en passant value)
+    for index in range(start, stop):
+        result = _classify(index, table, tablebases, board)
+        offset = index - start
+        if result is None:
+            values[offset] = ILLEGAL
+            continue
+        if result[0] is None:
+            if result[1]:
+                pending.extend((index, 0))  # checkmated
+            continue  # stalemate stays a draw
+        children, phantom, win, loss, ep_moves = result
+        counts[offset] = len(children) + phantom + len(ep_moves)
+        for child, value in ep_moves:
+            en_passant.extend((index, child, value))
+        conversion_loss[offset] = loss
+        if win:
+            pending.extend((index, win))
+        elif not counts[offset]:
+            pending.extend((index, loss))  # every move is a losing conversion
+    return start, values, counts, conversion_loss, pending, en_passant
+
+
+def _unmoves(index, table, board):
+    # Distinct indices of the legal positions one quiet move before index,
+    # leaving out double pushes that allow en passant (see generate())
+    squares, side = table.decode(index)
+    mover = side ^ 1
+    found = set()
+    _setup(table, board, squares)
+    try:
+        for i, code in enumerate(table.codes):
+            if code >> 3 != mover:
+                continue
+            to = squares[i]
+            kind = code & 7
+            if kind == PAWN:
+                back = -PAWN_DIRECTION[mover]
+                origins = []
+                frm = to + back
+                if not board[frm] and frm >> 3 != PROMOTION_ROW[side]:
+                    origins.append(frm)
+                    if frm >> 3 != PAWN_START_ROW[mover] and frm + back >> 3 == PAWN_START_ROW[mover] \
+                            and not board[frm + back]:
+                        origins.append(frm + back)
+            else:
+                origins = [frm for frm in _targets(board, code, to) if not board[frm]]
+            for frm in origins:
+                if kind == PAWN and abs(to - frm) == 16 and _en_passant_captures(board, squares, i, code):
+                    continue
+                board[to] = 0
+                board[frm] = code
+                legal = not is_attacked(board, squares[side], mover)
+                board[frm] = 0
+                board[to] = code
+                if legal:
+                    before = list(squares)
+                    before[i] = frm
+                    found.add(table.index(before, mover))
+    finally:
+        _clear(board, squares)
+    return found
+
+
+def _backward_chunk(indices):
+    table, board = _gen["table"], _gen["board"]
+    out = array("I")
+    for index in indices:
+        out.extend(_unmoves(index, table, board))
+    return out
+
+
+class _InlineExecutor:
+    # Stand-in for a one-process pool, so single-core builds skip pickling
+    def __init__(self, name, directory):
+        _init_generator(name, directory)
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+    def shutdown(self):
+        pass
+
+
+def generate(name, directory=TABLE_DIR, workers=None, verbose=True):
+    # Builds one table (its dependencies must already exist in directory)
+    # and writes it there; returns the path
+    workers = max(1, workers or os.cpu_count() or 1)
+    table = Table(name)
+    if len(table.codes) > MAX_PIECES:
+        raise ValueError(f"{name} has more than {MAX_PIECES} pieces")
+    start_time = time.perf_counter()
+    if workers == 1:
+        executor = _InlineExecutor(name, directory)
+    else:
+        executor = ProcessPoolExecutor(workers, initializer=_init_generator, initargs=(name, directory))
+    try:
+        values = bytearray(table.size)
+        counts = bytearray(table.size)
+        conversion_loss = bytearray(table.size)
+        buckets = defaultdict(list)
+        # A double push the opponent can take en passant gives it the child
+        # position's moves plus the capture, so the push is worth the better
+        # of the two for the opponent. These moves are resolved here from the
+        # child's value and the capture's instead of by _unmoves()
+        en_passant = defaultdict(list)  # child -> [(index, en passant value)]
+        capture_wins = defaultdict(list)  # plies -> [(index, child)]
+        step = max(4096, table.size // (workers * 16))
+        starts = range(0, table.size, step)
+        stops = [min(s + step, table.size) for s in starts]
+        for start, v, c, loss, pending, ep in executor.map(_forward_chunk, starts, stops):
+            values[start:start + len(v)] = v
+            counts[start:start + len(c)] = c
+            conversion_loss[start:start + len(loss)] = loss
+            for k in range(0, len(pending), 2):
+                buckets[pending[k + 1]].append(pending[k])
+            for k in range(0, len(ep), 3):
+                index, child, value = ep[k:k + 3]
+                en_passant[child].append((index, value))
+                result, distance = _outcome(value)
+                if result > 0:
+                    capture_wins[distance].append((index, child))
+
+        def lose_move(index, plies):
+            # One more move from index loses, to a position resolved at
+            # plies; once all of them do, index is lost
+            counts[index] -= 1
+            if not counts[index]:
+                buckets[max(plies + 1, conversion_loss[index])].append(index)
+
+        plies = 0
+        longest = 0
+        while buckets or capture_wins:
+            current = []
+            for index in buckets.pop(plies, ()):
+                if not values[index]:
+                    values[index] = plies + 1
+                    current.append(index)
+            if current:
+                longest = plies
+                chunk = max(256, len(current) // (workers * 4) + 1)
+                parts = [current[k:k + chunk] for k in range(0, len(current), chunk)]
+                for before in executor.map(_backward_chunk, parts):
+                    if plies & 1 == 0:
+                        # The side to move here is mated, so every position
+                        # that could move here wins one ply later
+                        for index in before:
+                            if not values[index]:
+                                buckets[plies + 1].append(index)
+                    else:
+                        # One more move from each predecessor loses
+                        for index in before:
+                            if not values[index]:
+                                lose_move(index, plies)
+                for child in current:
+                    for index, value in en_passant.get(child, ()):
+                        if values[index]:
+                            continue
+                        result, distance = _outcome(value)
+                        if plies & 1 == 0:
+                            # The opponent is lost after the push unless the
+                            # capture holds; if it loses too, the opponent
+                            # picks the slower loss
+                            if result < 0:
+                                buckets[max(plies, distance) + 1].append(index)
+                        elif result <= 0 or plies <= distance:
+                            lose_move(index, plies)
+            # Pushes whose en passant capture wins for the opponent are lost
+            # by now, unless the child's own win came first
+            for index, child in capture_wins.pop(plies, ()):
+                if not values[index] and not (values[child] and (values[child] - 1) & 1):
+                    lose_move(index, plies)
+            plies += 1
+    finally:
+        executor.shutdown()
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + EXTENSION)
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, name.encode(), table.size))
+        f.write(values)
+    os.replace(temp, path)
+    elapsed = time.perf_counter() - start_time
+    if verbose:
+        legal = table.size - values.count(ILLEGAL)
+        wins = sum(1 for v in values if v != ILLEGAL and v & 1 == 0 and v)
+        print(f"{name:<8} {legal:>10,} positions  {wins / max(legal, 1):6.1%} won for the side to move"
+              f"  longest mate {longest} plies  {elapsed:7.2f}s  {table.size / elapsed:>10,.0f} pos/s")
+    return path
+
+
+def build(names, directory=TABLE_DIR, workers=None, verbose=True):
+    # Builds the given tables and everything they depend on, skipping
+    # tables that already exist
+    built = []
+
+    def visit(name):
+        if name in built:
+            return
+        for dependency in dependencies(name):
+            visit(dependency)
+        if not os.path.exists(os.path.join(directory, name + EXTENSION)):
+            generate(name, directory, workers, verbose)
+        built.append(name)
+
+    for name in names:
+        visit(material_name(*_split(name))[0])
+    return built
+
+
+def _split(name):
+    codes = parse_material(name)
+    return ([c & 7 for c in codes[2:] if c >> 3 == WHITE],
+            [c & 7 for c in codes[2:] if c >> 3 == BLACK])
+
+
+def benchmark(worker_counts, name="KRvK"):
+    # Generation time for one table by worker count
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for dependency in dependencies(name):
+            build([dependency], directory, verbose=False)
+        for workers in worker_counts:
+            start = time.perf_counter()
+            generate(name, directory, workers, verbose=False)
+            rows.append((workers, time.perf_counter() - start))
+            tablebases = Tablebases(directory)
+            table = tablebases.tables[name]
+            positions = [table.decode(i) for i in range(0, table.size, 97)]
+            probes = 0
+            probe_start = time.perf_counter()
+            for squares, side in positions:
+                table.value(squares, side)
+                probes += 1
+            probe_rate = probes / (time.perf_counter() - probe_start)
+            tablebases.close()
+    base = rows[0][1]
+    print(f"{name}: {Table(name).size:,} entries, {probe_rate:,.0f} probes/sec")
+    print(f"{'workers':>7} {'seconds':>9} {'speedup':>8}")
+    for workers, elapsed in rows:
+        print(f"{workers:>7} {elapsed:>9.2f} {base / elapsed:>7.2f}x")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrograde endgame tablebases")
+    parser.add_argument("--dir", default=TABLE_DIR, help="table directory")
+    parser.add_argument("--build", nargs="*", metavar="MATERIAL",
+                        help="build these tables, e.g. KQvKR (default: every 3-piece table)")
+    parser.add_argument("--four", action="store_true", help="with --build, also build every 4-piece table")
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--fen", help="probe a position and print the best move")
+    parser.add_argument("--bench", nargs="?", const="KRvK", metavar="MATERIAL",
+                        help="time generating one table for each --workers count")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        benchmark(args.workers, args.bench)
+        return 0
+    if args.build is not None:
+        names = args.build or THREE_PIECE + (FOUR_PIECE if args.four else [])
+        too_large = [name for name in names if len(parse_material(name)) > MAX_PIECES]
+        if too_large:
+            parser.error(f"tables have at most {MAX_PIECES} pieces: {' '.join(too_large)}")
+        build(names, args.dir, args.workers[0])
+        return 0
+    tablebases = Tablebases(args.dir)
+    pos = Position(args.fen) if args.fen else Position("8/8/8/4k3/8/8/8/KQ6 w - - 0 1")
+    result = tablebases.probe(pos)
+    if result is None:
+        print("not in the tables")
+        return 1
+    wdl, plies = result
+    best = tablebases.best_move(pos)
+    print(f"{('loss', 'draw', 'win')[wdl + 1]} in {plies} plies"
+          + (f", best move {move_name(best[0])}" if best else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+# Headless self-play tournaments. Engines play each other on a process pool
+# from a set of varied openings, each opening once with either colour, and
+# the games are written as PGN together with win rates, Elo differences and
+# throughput. Nothing here imports pygame, so it runs without a display.
+#
+# An engine is LIMITS or LABEL=LIMITS, optionally followed by @MODULE:
+#   LIMITS  a difficulty ("Easy", "Med", "Hard") or e.g. "depth=3,nodes=20000,time_ms=200"
+#   MODULE  a module with a Search class to use instead of search.py, e.g. a
+#           copy of an older revision: git show HEAD~1:search.py > search_old.py
+#
+#   python tournament.py --games 20 --engine Easy --engine Med
+#   python tournament.py --games 40 --engine new=Med --engine old=Med@search_old --workers 4
+
+import argparse
+import importlib
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from book import open_book
+from movegen import generate_moves, in_check
+from pgn import format_game
+from position import WHITE, Position, move_name
+from search import DIFFICULTY_LIMITS
+from tt import TranspositionTable
+
+LIMIT_KEYS = ("depth", "nodes", "time_ms")
+MAX_PLIES = 400  # Games still running after this many plies are adjudicated a draw
+
+
+def parse_engine(spec):
+    # "old=depth=3,nodes=5000@search_old" -> {"label", "limits", "module"}
+    text, _, module = spec.partition("@")
+    label = None
+    if "=" in text and text.split("=", 1)[0] not in LIMIT_KEYS:
+        label, text = text.split("=", 1)
+    if text in DIFFICULTY_LIMITS:
+        limits = dict(DIFFICULTY_LIMITS[text])
+    else:
+        limits = {}
+        for part in text.split(","):
+            key, _, value = part.partition("=")
+            if key not in LIMIT_KEYS or not value:
+                raise ValueError(f"Bad engine limits {text!r}: use a difficulty or {', '.join(LIMIT_KEYS)}")
+            limits[key] = int(value)
+    return {"label": label or spec, "limits": limits, "module": module or "search"}
+
+
+def make_openings(count, book_plies=8, random_plies=2, seed=0):
+    # Distinct move sequences: weighted book moves while the book has any,
+    # then a few random legal moves for extra variety
+    rng = random.Random(seed)
+    book = open_book()
+    openings = []
+    seen = set()
+    for _ in range(count * 20):
+        if len(openings) == count:
+            break
+        pos = Position()
+        moves = []
+        for _ in range(book_plies if book is not None else 0):
+            move = book.choose(pos, rng)
+            if move is None:
+                break
+            pos.make(move)
+            moves.append(move)
+        for _ in range(random_plies):
+            legal = generate_moves(pos)
+            if not legal:
+                break
+            move = rng.choice(legal)
+            pos.make(move)
+            moves.append(move)
+        if tuple(moves) not in seen:
+            seen.add(tuple(moves))
+            openings.append(moves)
+    if book is not None:
+        book.close()
+    return openings
+
+
+# Per-process cache of engine modules
+_modules = {}
+
+
+def _engine_class(module):
+    if module not in _modules:
+        _modules[module] = importlib.import_module(module).Search
+    return _modules[module]
+
+
+def play_game(task):
+    # Plays one game; runs in a pool worker
+    engines = (task["white"], task["black"])
+    searches = [_engine_class(engine["module"]) for engine in engines]
+    tables = [TranspositionTable(task["hash_mb"]) for _ in engines]
+    pos = Position()
+    moves = []
+    for move in task["opening"]:
+        pos.make(move)
+        moves.append(move)
+    nodes = [0, 0]
+    start = time.perf_counter()
+    while True:
+        legal = generate_moves(pos)
+        if not legal:
+            if in_check(pos):
+                result = "0-1" if pos.side == WHITE else "1-0"
+                reason = "checkmate"
+            else:
+                result, reason = "1/2-1/2", "stalemate"
+            break
+        if pos.halfmove >= 100:
+            result, reason = "1/2-1/2", "fifty-move rule"
+            break
+        if pos.repetitions() >= 2:
+            result, reason = "1/2-1/2", "threefold repetition"
+            break
+        if pos.insufficient_material():
+            result, reason = "1/2-1/2", "insufficient material"
+            break
+        if len(moves) >= task["max_plies"]:
+            result, reason = "1/2-1/2", "move limit"
+            break
+        side = pos.side
+        search = searches[side](tt=tables[side], **engines[side]["limits"])
+        move = search.search(pos)
+        if move not in legal:
+            # A broken engine build forfeits instead of corrupting the game
+            result = "0-1" if side == WHITE else "1-0"
+            reason = f"illegal move {move_name(move) if move else 'none'}"
+            break
+        nodes[side] += search.nodes
+        pos.make(move)
+        moves.append(move)
+    return {
+        "round": task["round"],
+        "white": engines[0]["label"],
+        "black": engines[1]["label"],
+        "moves": moves,
+        "result": result,
+        "reason": reason,
+        "nodes": nodes,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def elo_difference(wins, draws, losses):
+    # Elo difference implied by the score, with a 95% confidence margin
+    games = wins + draws + losses
+    if not games:
+        return 0.0, float("inf")
+    score = (wins + draws / 2) / games
+    if score <= 0 or score >= 1:
+        return (float("inf") if score >= 1 else float("-inf")), float("inf")
+    elo = -400 * math.log10(1 / score - 1)
+    deviation = math.sqrt((wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                           + losses * score ** 2) / games / games)
+    high = min(score + 1.96 * deviation, 1 - 1e-9)
+    low = max(score - 1.96 * deviation, 1e-9)
+    margin = (-400 * math.log10(1 / high - 1) + 400 * math.log10(1 / low - 1)) / 2
+    return elo, margin
+
+
+def summarize(engines, results):
+    # Per-engine totals and head-to-head records
+    totals = {engine["label"]: [0, 0, 0] for engine in engines}
+    pairs = {}
+    for game in results:
+        white, black = game["white"], game["black"]
+        outcome = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}[game["result"]]
+        totals[white][outcome] += 1
+        totals[black][2 - outcome] += 1
+        key = tuple(sorted((white, black), key=[engine["label"] for engine in engines].index))
+        record = pairs.setdefault(key, [0, 0, 0])
+        record[outcome if white == key[0] else 2 - outcome] += 1
+    return totals, pairs
+
+
+def termination(reason):
+    # PGN Termination tag: games ended by the rules are "normal", the move
+    # limit is an adjudication and an illegal move forfeits
+    if reason == "move limit":
+        return "adjudication"
+    if reason.startswith("illegal move"):
+        return "rules infraction"
+    return "normal"
+
+
+def run_tournament(engines, games=10, workers=None, book_plies=8, random_plies=2, seed=0,
+                   hash_mb=4, max_plies=MAX_PLIES, pgn_path=None, quiet=False):
+    workers = max(1, workers or os.cpu_count() or 1)
+    pairings = list(itertools.combinations(engines, 2))
+    openings = make_openings((games + 1) // 2, book_plies, random_plies, seed)
+    tasks = []
+    for first, second in pairings:
+        # Each opening once with either colour; a small book may need to
+        # repeat openings to fill the schedule
+        schedule = itertools.cycle(openings)
+        for game in range(games):
+            if game % 2 == 0:
+                opening = next(schedule)
+            white, black = (first, second) if game % 2 == 0 else (second, first)
+            tasks.append({"round": len(tasks) + 1, "white": white, "black": black,
+                          "opening": opening, "hash_mb": hash_mb, "max_plies": max_plies})
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        finished = map(play_game, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(workers)
+        finished = executor.map(play_game, tasks)
+    try:
+        for game in finished:
+            results.append(game)
+            if not quiet:
+                print(f"game {len(results)}/{len(tasks)}: {game['white']} vs {game['black']} "
+                      f"{game['result']} ({game['reason']}, {len(game['moves'])} plies)", flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    if pgn_path:
+        today = date.today().strftime("%Y.%m.%d")
+        with open(pgn_path, "w") as f:
+            for game in results:
+                headers = {
+                    "Event": "Self-play", "Site": "headless", "Date": today, "Round": game["round"],
+                    "White": game["white"], "Black": game["black"], "Result": game["result"],
+                    "PlyCount": len(game["moves"]),
+                    "Termination": termination(game["reason"]),
+                }
+                f.write(format_game(headers, Position(), game["moves"], game["result"], game["reason"]))
+                f.write("\n")
+
+    totals, pairs = summarize(engines, results)
+    nodes = sum(sum(game["nodes"]) for game in results)
+    stats = {
+        "games": len(results),
+        "seconds": round(elapsed, 2),
+        "games_per_sec": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "nps": round(nodes / sum(game["seconds"] for game in results)) if results else 0,
+        "engines": {},
+        "pairs": [],
+    }
+    for label, (wins, draws, losses) in totals.items():
+        played = wins + draws + losses
+        stats["engines"][label] = {"wins": wins, "draws": draws, "losses": losses,
+                                   "score": round((wins + draws / 2) / played, 4) if played else 0.0}
+    for (a, b), (wins, draws, losses) in pairs.items():
+        elo, margin = elo_difference(wins, draws, losses)
+        stats["pairs"].append({"engine": a, "opponent": b, "wins": wins, "draws": draws, "losses": losses,
+                               "elo": round(elo, 1) + 0.0 if math.isfinite(elo) else None,
+                               "margin": round(margin, 1) if math.isfinite(margin) else None})
+    return results, stats
+
+
+def print_stats(stats):
+    print(f"\n{stats['games']} games in {stats['seconds']:.1f}s "
+          f"({stats['games_per_sec']:.2f} games/sec, {stats['nps']:,} nps)")
+    print(f"{'engine':<20} {'wins':>5} {'draws':>6} {'losses':>7} {'score':>7}")
+    for label, row in stats["engines"].items():
+        print(f"{label:<20} {row['wins']:>5} {row['draws']:>6} {row['losses']:>7} {row['score']:>7.1%}")
+    for pair in stats["pairs"]:
+        if pair["elo"] is None:
+            elo = "unbounded (no lost or no won games)"
+        else:
+            margin = f"{pair['margin']:.0f}" if pair["margin"] is not None else "inf"
+            elo = f"{pair['elo']:+.0f} +/- {margin}"
+        print(f"{pair['engine']} vs {pair['opponent']}: +{pair['wins']} ={pair['draws']} "
+              f"-{pair['losses']}, Elo {elo}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless AI-vs-AI tournament")
+    parser.add_argument("--engine", action="append", metavar="SPEC",
+                        help="engine to enter, at least two (default: Easy and Med)")
+    parser.add_argument("--games", type=int, default=10, help="games per pairing")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--book-plies", type=int, default=8, help="opening book moves before the engines take over")
+    parser.add_argument("--random-plies", type=int, default=2, help="random moves after the book for variety")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the opening choice")
+    parser.add_argument("--hash", type=int, default=4, help="transposition table MB per engine")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="adjudicate longer games as draws")
+    parser.add_argument("--pgn", default="tournament.pgn", help="PGN output file ('' to skip)")
+    parser.add_argument("--json", action="store_true", help="print the statistics as JSON")
+    args = parser.parse_args(argv)
+
+    engines = [parse_engine(spec) for spec in args.engine or ["Easy", "Med"]]
+    if len(engines) < 2:
+        parser.error("at least two engines are needed")
+    if len({engine["label"] for engine in engines}) != len(engines):
+        parser.error("engine labels must be unique; name them with LABEL=LIMITS")
+    _, stats = run_tournament(engines, args.games, args.workers, args.book_plies, args.random_plies,
+                              args.seed, args.hash, args.max_plies, args.pgn, quiet=args.json)
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        print_stats(stats)
+        if args.pgn:
+            print(f"PGN written to {args.pgn}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# Fixed-size transposition table stored in preallocated arrays.
+# Each bucket holds two entries: slot 0 keeps the deepest result of the
+# current search, slot 1 is always overwritten.
+#
+# The table can live in a caller-supplied buffer (e.g. shared memory used by
+# several search processes). Keys are stored XORed with their data word, so a
+# half-written entry from another process fails the key check instead of
+# returning mismatched data.
+
+from array import array
+
+EXACT, LOWER, UPPER = 1, 2, 3
+
+ENTRY_BYTES = 16  # one 64-bit key plus one 64-bit packed data word
+SCORE_OFFSET = 1 << 15
+
+# Packed data layout: move (16 bits) | score (16) | depth (8) | bound (2) | age (6)
+
+
+def table_entries(size_mb):
+    # Largest power-of-two bucket count that fits the budget, two entries each
+    buckets = 1
+    while buckets * 2 * 2 * ENTRY_BYTES <= size_mb * 1024 * 1024:
+        buckets *= 2
+    return buckets * 2
+
+
+def table_bytes(size_mb):
+    return table_entries(size_mb) * ENTRY_BYTES
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, buffer=None):
+        self.buffer = buffer
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        entries = table_entries(size_mb)
+        self.size_mb = size_mb
+        self.mask = entries // 2 - 1
+        if self.buffer is None:
+            self.keys = array("Q", bytes(8 * entries))
+            self.data = array("Q", bytes(8 * entries))
+        else:
+            words = memoryview(self.buffer).cast("B")[:entries * ENTRY_BYTES].cast("Q")
+            self.keys = words[:entries]
+            self.data = words[entries:]
+        self.age = 0
+        self.reset_stats()
+
+    def clear(self):
+        if self.buffer is None:
+            self.resize(self.size_mb)
+            return
+        size = len(self.keys) * ENTRY_BYTES
+        memoryview(self.buffer).cast("B")[:size] = bytes(size)
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        self.age = (self.age + 1) & 63
+
+    def probe(self, key):
+        # Returns (move, score, depth, bound) or None
+        self.probes += 1
+        index = (key & self.mask) << 1
+        keys = self.keys
+        data = self.data[index]
+        if keys[index] ^ data != key:
+            data = self.data[index + 1]
+            if keys[index + 1] ^ data != key:
+                return None
+        self.hits += 1
+        return (data & 0xFFFF, ((data >> 16) & 0xFFFF) - SCORE_OFFSET,
+                (data >> 32) & 0xFF, (data >> 40) & 3)
+
+    def store(self, key, move, score, depth, bound):
+        index = (key & self.mask) << 1
+        keys = self.keys
+        data = self.data
+        stored = data[index]
+        same = keys[index] ^ stored == key
+        # The depth-preferred slot takes the entry when it is deeper, refers to
+        # the same position or is left over from an earlier search.
+        if same or depth >= (stored >> 32) & 0xFF or (stored >> 42) != self.age:
+            if same and not move:
+                move = stored & 0xFFFF
+        else:
+            index += 1
+            stored = data[index]
+            same = keys[index] ^ stored == key
+            if same and not move:
+                move = stored & 0xFFFF
+        if stored and not same:
+            self.replacements += 1
+        self.stores += 1
+        word = (move | ((score + SCORE_OFFSET) << 16) | (min(max(depth, 0), 255) << 32)
+                | (bound << 40) | (self.age << 42))
+        data[index] = word
+        keys[index] = key ^ word
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def hashfull(self):
+        # Permille of sampled entries written during the current search
+        sample = min(len(self.data), 2000)
+        used = sum(1 for i in range(sample) if self.data[i] and self.data[i] >> 42 == self.age)
+        return used * 1000 // sample
+
+    def stats(self):
+        return {
+            "size_mb": self.size_mb,
+            "entries": len(self.keys),
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate(), 4),
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hashfull": self.hashfull(),
+        }
@@ -0,0 +1,326 @@
+# UCI front end, so standard chess GUIs and match tools can drive the engine
+# over stdin/stdout. Nothing here imports pygame.
+#
+# Supported: uci, isready, setoption (Hash, OwnBook, Move Overhead),
+# ucinewgame, position startpos|fen ... [moves ...], go with depth, nodes,
+# movetime, wtime/btime, winc/binc, movestogo, infinite and ponder, then
+# stop, ponderhit and quit.
+#
+#   python uci.py
+#   python main.py --uci
+
+import random
+import sys
+import threading
+import time
+
+from book import open_book
+from movegen import generate_moves
+from pawns import PawnTable
+from position import START_FEN, WHITE, Position, move_name
+from search import MATE_SCORE, MAX_PLY, Search
+from tablebase import Tablebases
+from tt import TranspositionTable
+
+ENGINE_NAME = "PyChess Engine"
+ENGINE_AUTHOR = "the chess game contributors"
+
+DEFAULT_HASH_MB = 16
+MOVE_OVERHEAD_MS = 30  # Kept back per move for GUI and pipe latency
+DEFAULT_MOVES_TO_GO = 30  # Moves assumed left when the clock has no moves-to-go
+
+
+class TimeManager:
+    # Per-move budgets from the clock. soft_ms is the time a move should take
+    # on average and hard_ms where a running iteration is cut off. The next
+    # depth usually costs more than all earlier ones together, so none is
+    # started past half of soft_ms or when it would probably overrun hard_ms;
+    # most moves then end on a completed depth close to soft_ms.
+    def __init__(self, overhead_ms=MOVE_OVERHEAD_MS):
+        self.overhead_ms = overhead_ms
+        self.soft_ms = None
+        self.hard_ms = None
+        self.fixed = False  # movetime: use the whole budget
+        self.started = 0.0
+
+    def allocate(self, time_left=None, increment=0, moves_to_go=None, movetime=None):
+        self.fixed = movetime is not None
+        if movetime is not None:
+            self.soft_ms = self.hard_ms = max(movetime - self.overhead_ms, 1)
+        elif time_left is not None:
+            usable = max(time_left - self.overhead_ms, 1)
+            moves = min(moves_to_go or DEFAULT_MOVES_TO_GO, DEFAULT_MOVES_TO_GO)
+            soft = min(usable / moves + increment * 3 / 4, usable / 2)
+            self.soft_ms = max(int(soft), 1)
+            self.hard_ms = max(int(min(soft * 2, usable * 3 / 4)), 1)
+        else:
+            self.soft_ms = self.hard_ms = None
+        return self.soft_ms, self.hard_ms
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def stop_after_iteration(self, search):
+        # Called once a depth completes: is starting another one a waste?
+        if self.soft_ms is None or self.fixed:
+            return False
+        elapsed = self.elapsed_ms()
+        if elapsed >= self.soft_ms / 2:
+            return True
+        iterations = search.iterations
+        if len(iterations) >= 2 and iterations[-2]["nodes"]:
+            growth = max(iterations[-1]["nodes"] / iterations[-2]["nodes"], 2.0)
+            return elapsed + iterations[-1]["ms"] * growth > self.hard_ms
+        return False
+
+
+def parse_position(tokens):
+    # "startpos moves e2e4 ..." or "fen <6 fields> moves ..."
+    if tokens and tokens[0] == "startpos":
+        fen, rest = START_FEN, tokens[1:]
+    elif tokens and tokens[0] == "fen":
+        end = tokens.index("moves") if "moves" in tokens else len(tokens)
+        fen, rest = " ".join(tokens[1:end]), tokens[end:]
+    else:
+        raise ValueError("position needs startpos or fen")
+    pos = Position(fen)
+    if rest and rest[0] == "moves":
+        for name in rest[1:]:
+            move = next((m for m in generate_moves(pos) if move_name(m) == name), None)
+            if move is None:
+                raise ValueError(f"illegal move {name}")
+            pos.make(move)
+    return pos
+
+
+def parse_go(tokens):
+    # (limits, ignored): go arguments as a dict, flags mapping to True and
+    # numbers to int, and the tokens that could not be read
+    limits = {}
+    ignored = []
+    flags = ("infinite", "ponder")
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in flags:
+            limits[token] = True
+            i += 1
+        elif token == "searchmoves":
+            limits["searchmoves"] = tokens[i + 1:]
+            break
+        else:
+            try:
+                limits[token] = int(tokens[i + 1])
+                i += 2
+            except (ValueError, IndexError):
+                # Skip just this token, so the next one is read as a keyword
+                ignored.append(token)
+                i += 1
+    return limits, ignored
+
+
+def format_score(score):
+    if abs(score) >= MATE_SCORE - MAX_PLY:
+        plies = MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.tt = TranspositionTable(self.hash_mb)
+        self.pawn_table = PawnTable()
+        self.tablebases = Tablebases()
+        self.book = None
+        self.own_book = False
+        self.time_manager = TimeManager()
+        self.position = Position()
+        self.search = None
+        self.thread = None
+        self.pondering = False
+        self.infinite = False
+        self.release = threading.Event()  # lets a finished ponder/infinite search report
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def handle(self, line):
+        # Returns False once the engine should exit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 1024")
+            self.send("option name OwnBook type check default false")
+            self.send(f"option name Move Overhead type spin default {MOVE_OVERHEAD_MS} min 0 max 5000")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.wait()
+            self.tt.clear()
+            self.pawn_table = PawnTable()
+        elif command == "position":
+            self.wait()
+            try:
+                self.position = parse_position(args)
+            except (ValueError, KeyError, IndexError) as error:
+                self.send(f"info string bad position: {error}")
+        elif command == "go":
+            self.wait()
+            limits, ignored = parse_go(args)
+            if ignored:
+                self.send(f"info string ignoring go arguments: {' '.join(ignored)}")
+            self.go(limits)
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            self.stop()
+            return False
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def set_option(self, args):
+        text = " ".join(args)
+        if not text.startswith("name "):
+            return
+        name, _, value = text[5:].partition(" value ")
+        name = name.strip().lower()
+        value = value.strip()
+        self.wait()
+        if name == "hash" and value.isdigit():
+            self.hash_mb = max(1, int(value))
+            self.tt.resize(self.hash_mb)
+        elif name == "ownbook":
+            self.own_book = value.lower() == "true"
+            if self.own_book and self.book is None:
+                self.book = open_book()
+        elif name == "move overhead" and value.isdigit():
+            self.time_manager.overhead_ms = int(value)
+
+    def go(self, limits):
+        pos = self.position
+        if self.own_book and self.book is not None and not limits.get("ponder"):
+            move = self.book.choose(pos, random)
+            if move is not None:
+                self.send(f"bestmove {move_name(move)}")
+                return
+        us = "w" if pos.side == WHITE else "b"
+        manager = self.time_manager
+        manager.allocate(limits.get(f"{us}time"), limits.get(f"{us}inc", 0),
+                         limits.get("movestogo"), limits.get("movetime"))
+        self.pondering = bool(limits.get("ponder"))
+        self.infinite = bool(limits.get("infinite"))
+        # Pondering and infinite searches only get a deadline on ponderhit
+        timed = not self.pondering and not self.infinite
+        search = Search(depth=limits.get("depth", MAX_PLY), nodes=limits.get("nodes"),
+                        time_ms=manager.hard_ms if timed else None, tt=self.tt,
+                        on_iteration=self.report, tablebases=self.tablebases, pawn_table=self.pawn_table)
+        if limits.get("searchmoves"):
+            self.send("info string searchmoves is not supported; searching all moves")
+        self.search = search
+        self.release.clear()
+        manager.start()
+        self.thread = threading.Thread(target=self.run, args=(search, pos.copy()), daemon=True)
+        self.thread.start()
+
+    def run(self, search, pos):
+        move = search.search(pos)
+        if self.pondering or self.infinite:
+            # UCI forbids a bestmove before ponderhit or stop
+            self.release.wait()
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        line = f"bestmove {move_name(move)}"
+        reply = self.expected_reply(pos, move, search.pv)
+        if reply:
+            line += f" ponder {move_name(reply)}"
+        self.send(line)
+
+    def expected_reply(self, pos, move, pv):
+        # The opponent's move to ponder on: from the PV, or failing that the
+        # transposition table, since the PV stops at a table cutoff
+        if len(pv) >= 2 and pv[0] == move:
+            return pv[1]
+        pos.make(move)
+        try:
+            entry = self.tt.probe(pos.hash)
+            if entry is not None and entry[0] in generate_moves(pos):
+                return entry[0]
+        finally:
+            pos.unmake()
+        return None
+
+    def report(self, search):
+        # on_iteration hook: one info line per completed depth
+        stats = search.iterations[-1]
+        elapsed = max(self.time_manager.elapsed_ms(), 1)
+        pv = " ".join(move_name(move) for move in search.pv)
+        self.send(f"info depth {stats['depth']} score {format_score(stats['score'])} nodes {search.nodes} "
+                  f"nps {int(search.nodes * 1000 / elapsed)} time {int(elapsed)} "
+                  f"hashfull {self.tt.hashfull()} pv {pv}")
+        if not self.pondering and not self.infinite and self.time_manager.stop_after_iteration(search):
+            search.stop()
+
+    def ponderhit(self):
+        # The predicted move was played: the ponder search goes on as a
+        # normal timed search, its clock starting now
+        search = self.search
+        if search is None or not self.pondering:
+            return
+        manager = self.time_manager
+        manager.start()
+        self.pondering = False
+        if manager.hard_ms is not None and not self.infinite:
+            search.deadline = time.perf_counter() + manager.hard_ms / 1000
+        # A ponder search that already finished reports straight away
+        self.release.set()
+
+    def stop(self):
+        if self.search is not None:
+            self.search.stop()
+        self.release.set()
+        self.wait()
+
+    def wait(self):
+        # Blocks until the running search has sent its bestmove
+        if self.thread is not None:
+            if self.pondering or self.infinite:
+                # A new command ends a ponder or infinite search like stop does
+                self.search.stop()
+                self.release.set()
+            self.thread.join()
+            self.thread = None
+            self.pondering = self.infinite = False
+
+
+def main(stdin=sys.stdin):
+    engine = UciEngine()
+    for line in stdin:
+        if not engine.handle(line.strip()):
+            break
+    engine.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# Runs the search on a background thread so the caller's loop keeps going.
+# The caller polls for the finished move and can cancel at any time.
+#
+#   done, move = worker.poll()   # move is None when the position has none
+
+import threading
+
+from parallel import ParallelSearch
+from pawns import PawnTable
+from search import Search
+
+
+class SearchWorker:
+    def __init__(self, tt=None, pool=None, tablebases=None):
+        # With a parallel.SearchPool the search runs Lazy SMP across its processes
+        self.tt = tt
+        self.pool = pool
+        self.tablebases = tablebases
+        self.pawn_table = PawnTable()  # pawn structure carries over from move to move
+        self.search = None
+        self.thread = None
+        self.result = None
+        self.error = None  # exception that ended the last search, if any
+
+    def start(self, pos, **limits):
+        # Searches a copy, so the caller may keep reading (or replace) its position
+        self.cancel()
+        if self.pool is not None:
+            self.search = ParallelSearch(self.pool, **limits)
+        else:
+            self.search = Search(tt=self.tt, tablebases=self.tablebases, pawn_table=self.pawn_table,
+                                 **limits)
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(pos.copy(),), daemon=True)
+        self.thread.start()
+
+    def _run(self, pos):
+        try:
+            self.result = self.search.search(pos)
+        except Exception as error:  # e.g. BrokenProcessPool when a pool process dies
+            self.error = error
+
+    def idle(self):
+        return self.thread is None
+
+    def thinking(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def poll(self):
+        # (done, move): done turns True once, when the search has finished;
+        # move is its result, None if the position had no legal move. A search
+        # that failed raises its exception here instead
+        if self.thread is None or self.thread.is_alive():
+            return False, None
+        self.thread = None
+        if self.error is not None:
+            raise self.error
+        return True, self.result
+
+    def stop(self):
+        # Ends the search early and returns the best move found so far
+        if self.thread is None:
+            return None
+        self.search.stop()
+        self.thread.join()
+        self.thread = None
+        return self.result
+
+    def cancel(self):
+        self.stop()
+        self.result = None
+
+    def info(self):
+        # (depth being searched, nodes so far) for progress displays
+        if self.search is None:
+            return 0, 0
+        return self.search.current_depth, self.search.nodes
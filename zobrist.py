@@ -0,0 +1,12 @@
+# Zobrist keys for position hashing. The seed is fixed so hashes are stable
+# between runs and across processes.
+
+import random
+
+_rng = random.Random(0x5EED_C4E55)
+
+# PIECE_KEYS[piece_code][square]; codes 0 and 7 are unused but keep indexing direct
+PIECE_KEYS = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(15)]
+CASTLE_KEYS = [_rng.getrandbits(64) for _ in range(16)]
+EP_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+SIDE_KEY = _rng.getrandbits(64)